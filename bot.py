@@ -3,18 +3,24 @@ import time
 import sys
 import pytz
 import json
+import signal
 import logging
+import threading
 from os.path import join , dirname
 from dotenv import load_dotenv
 import telegram
 from telegram.message import Message
-from search.free_classroom import find_free_room
-from search.find_classrooms import TIME_SHIFT , MAX_TIME , MIN_TIME
-from telegram import  Update , ReplyKeyboardMarkup ,ReplyKeyboardRemove
-from telegram.ext import (PicklePersistence,Updater,CommandHandler,ConversationHandler,CallbackContext,MessageHandler , Filters , CallbackQueryHandler)
+from search.free_classroom import find_free_room , free_rooms_of_day
+from search.find_classrooms import TIME_SHIFT , MAX_TIME , MIN_TIME , load_day , on_schedule_change , is_stale , data_version , page_store , PAGE_STORE_VACUUM_INTERVAL
+from search.prefetcher import Prefetcher , PREFETCH_INTERVAL
+from telegram import  Update , ReplyKeyboardMarkup ,ReplyKeyboardRemove , InlineKeyboardMarkup
+from telegram.ext import (Updater,CommandHandler,ConversationHandler,CallbackContext,MessageHandler , Filters , CallbackQueryHandler)
 from datetime import datetime , timedelta
 from telegram import ParseMode
-from functions import errorhandler , string_builder , input_check , keyboard_builder , user_data_handler ,regex_builder
+from telegram.constants import MAX_MESSAGE_LENGTH
+from functions import errorhandler , string_builder , input_check , keyboard_builder , user_data_handler ,regex_builder , watch_handler
+from functions.sqlite_persistence import SQLitePersistence , save_bot_data_after_jobs , INACTIVE_USER_DAYS , USER_ARCHIVE_PATH , COMPACT_INTERVAL
+from functions.now_cache import NowCache , now_window , NOW_INTERVAL
 
 
 LOGPATH = "log/"
@@ -73,8 +79,23 @@ for lang in texts:
         command_keys[key].append(texts[lang]["keyboards"][key])
 
 KEYBOARDS = keyboard_builder.KeyboadBuilder(texts , location_dict)
+NOW_ANSWERS = NowCache(texts , location_dict)
 
 TOKEN = os.environ.get("TOKEN")
+RESULT_PAGER_THRESHOLD = int(os.environ.get("RESULT_PAGER_THRESHOLD" , 0)) # results longer than this many messages are paged, 0 to disable
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL" , "https://api.telegram.org/bot") # e.g. a local fake Telegram endpoint for tests
+WORKERS = int(os.environ.get("WORKERS" , 4)) # threads running the searches (the run_async handlers), other updates run on the dispatcher thread
+
+"""
+Webhook mode, used when WEBHOOK_URL is set (e.g. https://example.org behind a
+reverse proxy forwarding to WEBHOOK_LISTEN:WEBHOOK_PORT). Otherwise the bot polls.
+"""
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL" , "")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN" , "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT" , 8443))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH" , "") # secret path of the webhook, defaults to the token
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS" , 40))
+DRAIN_TIMEOUT = 30 # seconds the queued updates are given to complete on shutdown
 
 
 """
@@ -117,8 +138,8 @@ def search(update: Update , context : CallbackContext , lang) -> int:
 def now(update: Update , context : CallbackContext, lang) -> int:
     """Performs a quick search based on user preferences.
 
-    If preferences are set, proceeds to the end state. Otherwise, prompts the user
-    to set preferences.
+    If preferences are set, sends the answer precomputed by NowCache, or proceeds
+    to the end state when it is missing. Otherwise, prompts the user to set preferences.
 
     Args:
         update (Update): The Telegram update object.
@@ -136,22 +157,27 @@ def now(update: Update , context : CallbackContext, lang) -> int:
         update.message.reply_text(texts[lang]["texts"]["missing"] , reply_markup=ReplyKeyboardMarkup(KEYBOARDS.initial_keyboard(lang)))
         return INITIAL_STATE
 
-    start_time = int(datetime.now(pytz.timezone('Europe/Rome')).strftime('%H'))
-    if start_time >= MAX_TIME or start_time < MIN_TIME:
+    date , start_time , end_time , closed = now_window(dur)
+    if closed:
         update.message.reply_text(texts[lang]["texts"]['ops'])
-        start_time = MIN_TIME
-    end_time = start_time + dur if start_time + dur < MAX_TIME else MAX_TIME
 
+    answer = NOW_ANSWERS.get(loc , dur , user_data_handler.get_format_mode(context) , lang)
+    if answer is not None:
+        send_results(update , *answer , lang)
+        user_data_handler.reset_user_data(update , context)
+        return INITIAL_STATE
+
+    session = user_data_handler.get_session(update)
     if loc in location_dict:
-        context.user_data["location"] = location_dict[loc]["code"]
-        context.user_data["location_name"] = loc
+        session["location"] = location_dict[loc]["code"]
+        session["location_name"] = loc
     else:
         # Fallback if somehow invalid
-        context.user_data["location"] = loc
-        context.user_data["location_name"] = loc
+        session["location"] = loc
+        session["location_name"] = loc
 
-    context.user_data["date"] = datetime.now(pytz.timezone('Europe/Rome')).strftime("%d/%m/%Y")
-    context.user_data["start_time"] = start_time
+    session["date"] = date
+    session["start_time"] = start_time
     update.message.text = str(end_time)
     return end_state(update, context)
 
@@ -413,7 +439,7 @@ def set_campus_selection_state(update: Update, context: CallbackContext) -> int:
 
     # selezionato un campus (chiave top-level)
     if message in location_dict:
-        context.user_data["selected_campus_for_sedi"] = message
+        user_data_handler.get_session(update)["selected_campus_for_sedi"] = message
         update.message.reply_text(
             texts[lang]["texts"]["location"],
             reply_markup=ReplyKeyboardMarkup(KEYBOARDS.location_keyboard(lang, campus=message), one_time_keyboard=True)
@@ -424,7 +450,7 @@ def set_campus_selection_state(update: Update, context: CallbackContext) -> int:
     for campus, data in location_dict.items():
         sedi = data.get("sedi", {}) if isinstance(data, dict) else {}
         if message in sedi:
-            context.user_data["location"] = message
+            user_data_handler.get_session(update)["location"] = message
             update.message.reply_text(texts[lang]["texts"]['day'],
                                       reply_markup=ReplyKeyboardMarkup(KEYBOARDS.day_keyboard(lang), one_time_keyboard=True))
             return SET_DAY
@@ -441,6 +467,7 @@ def set_sublocation_state(update: Update, context: CallbackContext) -> int:
 
     cancel_label = texts[lang]["keyboards"]["cancel"]
     all_label = texts[lang]["keyboards"]["all_buildings"]
+    session = user_data_handler.get_session(update)
 
     # Indietro / annulla -> torna alla lista campus
     if message == cancel_label:
@@ -458,12 +485,12 @@ def set_sublocation_state(update: Update, context: CallbackContext) -> int:
             break
 
     if is_all_buildings:
-        campus = context.user_data.get("selected_campus_for_sedi")
+        campus = session.get("selected_campus_for_sedi")
         if campus and campus in location_dict:
             # Save the CAMPUS CODE (e.g. MIA)
-            context.user_data["location"] = location_dict[campus]["code"]
+            session["location"] = location_dict[campus]["code"]
             # Save the NAME for display
-            context.user_data["location_name"] = campus
+            session["location_name"] = campus
             update.message.reply_text(texts[lang]["texts"]['day'],
                                       reply_markup=ReplyKeyboardMarkup(KEYBOARDS.day_keyboard(lang), one_time_keyboard=True))
             return SET_DAY
@@ -474,14 +501,14 @@ def set_sublocation_state(update: Update, context: CallbackContext) -> int:
 
     # scelta di una singola sede
     # We need to find which campus contains this sede
-    selected_campus = context.user_data.get("selected_campus_for_sedi")
+    selected_campus = session.get("selected_campus_for_sedi")
     if selected_campus and selected_campus in location_dict:
          data = location_dict[selected_campus]
          sedi = data.get("sedi", {}) if isinstance(data, dict) else {}
          if message in sedi:
              # Save the SEDE CODE (e.g. MIA02)
-             context.user_data["location"] = sedi[message]
-             context.user_data["location_name"] = message
+             session["location"] = sedi[message]
+             session["location_name"] = message
              update.message.reply_text(texts[lang]["texts"]['day'],
                                        reply_markup=ReplyKeyboardMarkup(KEYBOARDS.day_keyboard(lang), one_time_keyboard=True))
              return SET_DAY
@@ -510,7 +537,7 @@ def set_day_state(update: Update , context: CallbackContext) ->int:
         errorhandler.bonk(update , texts , lang)
         return SET_DAY
 
-    context.user_data['date'] = chosen_date
+    user_data_handler.get_session(update)['date'] = chosen_date
     update.message.reply_text(texts[lang]["texts"]['starting_time'],reply_markup=ReplyKeyboardMarkup(KEYBOARDS.start_time_keyboard(lang) , one_time_keyboard=True) )
 
     return SET_START_TIME
@@ -539,7 +566,7 @@ def set_start_time_state(update: Update , context: CallbackContext) ->int:
         errorhandler.bonk(update , texts , lang )
         return SET_START_TIME
 
-    context.user_data['start_time'] = start_time
+    user_data_handler.get_session(update)['start_time'] = start_time
     update.message.reply_text(texts[lang]["texts"]['ending_time'],reply_markup=ReplyKeyboardMarkup(KEYBOARDS.end_time_keyboard(lang ,start_time ) , one_time_keyboard=True) )
 
     return SET_END_AND_SEND
@@ -564,10 +591,17 @@ def end_state(update: Update , context: CallbackContext) ->int:
     initial_keyboard = KEYBOARDS.initial_keyboard(lang)
     format_mode = user_data_handler.get_format_mode(context)
 
-    start_time = context.user_data['start_time']
-    date = context.user_data['date']
-    location = context.user_data['location']
-    location_name = context.user_data.get('location_name', location) # Fallback to code if name missing
+    session = user_data_handler.get_session(update)
+    if not all(step in session for step in ('location' , 'date' , 'start_time')):
+        # the session expired (or the bot restarted) in the middle of the search
+        update.message.reply_text(texts[lang]["texts"]["session_expired"] , reply_markup=ReplyKeyboardMarkup(initial_keyboard))
+        user_data_handler.reset_user_data(update , context)
+        return INITIAL_STATE
+
+    start_time = session['start_time']
+    date = session['date']
+    location = session['location']
+    location_name = session.get('location_name', location) # Fallback to code if name missing
     
     ret ,end_time = input_check.end_time_check(message ,start_time)
 
@@ -581,18 +615,24 @@ def end_state(update: Update , context: CallbackContext) ->int:
     try:
         update.message.reply_text(texts[lang]["texts"]["loading"])
         # Pass location code directly
-        available_rooms = find_free_room(float(start_time + TIME_SHIFT) , float(end_time + TIME_SHIFT) , location, int(day) , int(month) , int(year))
+        parsed = load_day(location , int(day) , int(month) , int(year))
+        cache_key = (location , date , start_time , end_time , format_mode , lang , data_version(parsed))
+        results = None if session.get('watch') else string_builder.get_rendered(cache_key)
+        if results is None:
+            available_rooms = free_rooms_of_day(parsed , float(start_time + TIME_SHIFT) , float(end_time + TIME_SHIFT))
+            results = string_builder.render_results(available_rooms , texts[lang]["texts"], format_mode , cache_key)
         
         # Friendly Header
-        header = f"📅 <b>{date}</b>\n📍 <b>{location_name}</b>\n⏰ <b>{start_time}:00 - {end_time}:00</b>"
-        update.message.reply_text(header, parse_mode=ParseMode.HTML)
-        
-        if not available_rooms:
-             update.message.reply_text(texts[lang]["texts"]["no_rooms"])
-        else:
-            for m in string_builder.room_builder_str(available_rooms , texts[lang]["texts"], format_mode):
-                update.message.reply_chat_action(telegram.ChatAction.TYPING)
-                update.message.reply_text(m,parse_mode=ParseMode.HTML , reply_markup=ReplyKeyboardMarkup(initial_keyboard))
+        header = string_builder.header_str(date , location_name , start_time , end_time , texts[lang]["texts"] , parsed.fetched_at if is_stale(parsed) else None)
+        send_results(update , header , results , lang)
+
+        if session.get('watch'):
+            watch = {'location' : location , 'location_name' : location_name , 'date' : date , 'start_time' : start_time , 'end_time' : end_time ,
+                     'lang' : lang , 'format' : format_mode , 'free' : free_room_keys(available_rooms)}
+            if watch_handler.add_watch(context , update.message.chat_id , watch):
+                update.message.reply_text(texts[lang]["texts"]["watch_added"] , reply_markup=ReplyKeyboardMarkup(initial_keyboard))
+            else:
+                update.message.reply_text(texts[lang]["texts"]["watch_limit"].format(watch_handler.MAX_WATCHES) , reply_markup=ReplyKeyboardMarkup(initial_keyboard))
 
         logging.info("%d : %s search was: %s %s %d %d" , user.id , user.username , location , date , start_time , end_time )
     except Exception as e:
@@ -601,11 +641,181 @@ def end_state(update: Update , context: CallbackContext) ->int:
         update.message.reply_text(texts[lang]["texts"]["exception"] ,parse_mode=ParseMode.HTML , reply_markup=ReplyKeyboardMarkup(initial_keyboard) ,disable_web_page_preview=True)
 
 
-    user_data_handler.reset_user_data(context)
+    user_data_handler.reset_user_data(update , context)
+
+    return INITIAL_STATE
+
+
+
+def send_results(update: Update , header , results , lang):
+    """Sends the header and the results of a search, in as few messages as possible.
+
+    The header is sent along with the first message when it fits. Results longer
+    than RESULT_PAGER_THRESHOLD messages are replaced by their summary, with
+    inline buttons to browse the rooms (see show_page).
+
+    Args:
+        update (Update): The Telegram update object.
+        header (str): The header built by string_builder.header_str.
+        results (Results): The results built by string_builder.render_results.
+        lang (str): The language code.
+    """
+    keyboard = ReplyKeyboardMarkup(KEYBOARDS.initial_keyboard(lang))
+    messages = results.messages
+
+    if not messages:
+        update.message.reply_text(header + '\n\n' + texts[lang]["texts"]["no_rooms"] , parse_mode=ParseMode.HTML , reply_markup=keyboard)
+    elif RESULT_PAGER_THRESHOLD and len(messages) > RESULT_PAGER_THRESHOLD:
+        pages = [results.summary] + messages
+        token = string_builder.store_pages(pages)
+        # the reply keyboard and the inline buttons cannot share a message
+        update.message.reply_text(header , parse_mode=ParseMode.HTML , reply_markup=keyboard)
+        update.message.reply_text(pages[0] , parse_mode=ParseMode.HTML , reply_markup=InlineKeyboardMarkup(KEYBOARDS.pager_keyboard(lang , token , 0 , len(pages))) , disable_web_page_preview=True)
+    else:
+        if len(header) + 1 + len(messages[0]) <= MAX_MESSAGE_LENGTH:
+            messages = [header + '\n' + messages[0]] + messages[1:]
+        else:
+            messages = [header] + messages
+        if len(messages) > 1:
+            update.message.reply_chat_action(telegram.ChatAction.TYPING)
+        for m in messages:
+            update.message.reply_text(m , parse_mode=ParseMode.HTML , reply_markup=keyboard)
+
+
+def show_page(update: Update , context: CallbackContext):
+    """Shows another page of a paged result, editing the message in place.
+
+    Args:
+        update (Update): The Telegram update object, with the callback query "page:<token>:<page>".
+        context (CallbackContext): The callback context.
+    """
+    query = update.callback_query
+    lang = user_data_handler.get_lang(context)
+    _ , token , page = query.data.split(':')
+    pages = string_builder.get_pages(token)
+    if pages is None or int(page) >= len(pages):
+        query.answer(texts[lang]["texts"]["pages_expired"])
+        query.edit_message_reply_markup(reply_markup=None)
+        return
+    query.answer()
+    query.edit_message_text(pages[int(page)] , parse_mode=ParseMode.HTML , reply_markup=InlineKeyboardMarkup(KEYBOARDS.pager_keyboard(lang , token , int(page) , len(pages))) , disable_web_page_preview=True)
+
+
+"""WATCH"""
+
+def watch(update: Update , context: CallbackContext) -> int:
+    """Starts a search that, once completed, subscribes the user to the rooms freeing up.
+
+    Args:
+        update (Update): The Telegram update object.
+        context (CallbackContext): The callback context.
+
+    Returns:
+        int: The next state (SET_CAMPUS_SELECTION).
+    """
+    user = update.message.from_user
+    lang = user_data_handler.initialize_user_data(context)
+    logging.info("%d : %s started a watch" , user.id , user.username)
+    user_data_handler.reset_user_data(update , context)
+    user_data_handler.get_session(update)['watch'] = True
+    update.message.reply_text(texts[lang]["texts"]["watch"])
+    return search(update , context , lang)
+
+
+def unwatch(update: Update , context: CallbackContext) -> int:
+    """Removes every subscription of the user.
 
+    Args:
+        update (Update): The Telegram update object.
+        context (CallbackContext): The callback context.
+
+    Returns:
+        int: The initial state (INITIAL_STATE).
+    """
+    user = update.message.from_user
+    lang = user_data_handler.initialize_user_data(context)
+    removed = watch_handler.remove_watches(context , update.message.chat_id)
+    logging.info("%d : %s removed %d watches" , user.id , user.username , removed)
+    update.message.reply_text(texts[lang]["texts"]["unwatch"].format(removed) , reply_markup=ReplyKeyboardMarkup(KEYBOARDS.initial_keyboard(lang)))
     return INITIAL_STATE
 
 
+def free_room_keys(available_rooms):
+    """Lists the free rooms of a search as [building, room] pairs, as stored in the subscriptions.
+
+    Args:
+        available_rooms (dict): The rooms returned by free_rooms_of_day.
+
+    Returns:
+        list: The [building, room] pairs.
+    """
+    return [[building , room.name] for building in available_rooms for room in available_rooms[building]]
+
+
+def check_watches(context: CallbackContext):
+    """Re-evaluates every subscription and notifies the rooms that became free.
+
+    Subscriptions are grouped by (location, date): each page is loaded once from
+    the cache, whatever the number of users watching it. Every user receives at
+    most one batch of messages per run, and batches are spread at NOTIFY_RATE.
+    A job whose context is a (location, date) page re-evaluates that page only.
+    """
+    batches = {}
+    now = datetime.now(pytz.timezone('Europe/Rome'))
+    page = context.job.context if context.job else None
+    for (location , date) , watches in watch_handler.grouped_watches(context.bot_data).items():
+        if page and page != (location , date):
+            continue
+        day , month , year = date.split('/')
+        try:
+            parsed = load_day(location , int(day) , int(month) , int(year))
+        except Exception as e:
+            logging.warning("Watch check of %s %s failed: %s" , location , date , e)
+            continue
+        for chat_id , watch in watches:
+            window = watch_handler.watch_window(watch , now)
+            if window is None:
+                continue # over, dropped at the next run
+            available_rooms = free_rooms_of_day(parsed , *window)
+            known = watch_handler.update_free(watch , free_room_keys(available_rooms))
+            freed = {}
+            for building in available_rooms:
+                rooms = [room for room in available_rooms[building] if (building , room.name) not in known]
+                if rooms:
+                    freed[building] = rooms
+            if freed:
+                lang = watch['lang']
+                header = texts[lang]["texts"]["watch_free"].format(watch['location_name'] , watch['date'] , watch['start_time'] , watch['end_time'])
+                batches.setdefault(chat_id , []).extend([header] + string_builder.room_builder_str(freed , texts[lang]["texts"] , watch['format']))
+
+    for i , (chat_id , messages) in enumerate(batches.items()):
+        context.job_queue.run_once(send_notifications , i / watch_handler.NOTIFY_RATE , context=(chat_id , string_builder.join_messages(messages)))
+    if batches:
+        logging.info("Watch check: notifying %d users" , len(batches))
+
+
+def recheck_watches(job_queue):
+    """Returns an on_schedule_change listener re-evaluating at once the subscriptions of a changed day."""
+    def listener(location , day , month , year , changes):
+        for change in changes:
+            logging.debug("%s %d/%d/%d %s %s: %d lessons added, %d removed" , location , day , month , year , change.building , change.room , len(change.added) , len(change.removed))
+        job_queue.run_once(check_watches , 0 , context=(location , f"{day:02d}/{month:02d}/{year}"))
+    return listener
+
+
+def send_notifications(context: CallbackContext):
+    """Sends a batch of watch notifications to a user."""
+    chat_id , messages = context.job.context
+    try:
+        for m in messages:
+            context.bot.send_message(chat_id , m , parse_mode=ParseMode.HTML , disable_web_page_preview=True)
+    except telegram.error.Unauthorized:
+        # the user blocked the bot
+        watch_handler.remove_watches(context , chat_id)
+    except telegram.error.TelegramError as e:
+        logging.warning("Watch notification to %d failed: %s" , chat_id , e)
+
+
 
 """FALLBACKS"""
 
@@ -624,6 +834,7 @@ def terminate(update: Update, context: CallbackContext) -> int:
     user = update.message.from_user
     lang = user_data_handler.get_lang(context)
     context.user_data.clear()
+    user_data_handler.clear_session(update)
 
     logging.info("%d : %s terminated the conversation.", user.id , user.username)
     update.message.reply_text(texts[lang]["texts"]['terminate'], reply_markup=ReplyKeyboardRemove())
@@ -659,7 +870,7 @@ def cancel(update: Update, context: CallbackContext):
     user = update.message.from_user
     lang = user_data_handler.get_lang(context)
     initial_keyboard = KEYBOARDS.initial_keyboard(lang)
-    user_data_handler.reset_user_data(context)
+    user_data_handler.reset_user_data(update , context)
     logging.info("%d : %s canceled.", user.id , user.username)
     update.message.reply_text(texts[lang]["texts"]['cancel'] ,parse_mode=ParseMode.HTML , reply_markup=ReplyKeyboardMarkup(initial_keyboard))
     return INITIAL_STATE
@@ -674,23 +885,26 @@ if not os.path.exists(DATAPATH):
     os.mkdir(DATAPATH)
 
 def main():
-    #add persistence for states
-    pp = PicklePersistence(filename=join(DATAPATH, 'aulelibere_pp'))
+    #add persistence for states, imported from the former pickle file on first start
+    pp = SQLitePersistence(join(DATAPATH, 'aulelibere.sqlite') , migrate_from=join(DATAPATH, 'aulelibere_pp'))
 
     regex = regex_builder.RegexBuilder(texts)
 
-    updater = Updater(token=TOKEN , use_context=True , persistence=pp)
+    updater = Updater(token=TOKEN , use_context=True , persistence=pp , workers=WORKERS , base_url=TELEGRAM_API_URL)
     dispatcher = updater.dispatcher
+    save_bot_data_after_jobs(updater.job_queue , pp)
 
+    # the searches wait on PoliMi on a cold cache: they run on the WORKERS threads so that other users are not blocked
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler('start',start)],
+        # the main menu is an entry point too, for the users whose state was compacted away
+        entry_points=[CommandHandler('start',start) , CommandHandler('watch',watch) , CommandHandler('unwatch',unwatch) , MessageHandler(Filters.regex(regex.initial_state()),initial_state , run_async=True)],
         states={
-            INITIAL_STATE : [MessageHandler(Filters.regex(regex.initial_state()),initial_state)],
+            INITIAL_STATE : [MessageHandler(Filters.regex(regex.initial_state()),initial_state , run_async=True)],
             SET_CAMPUS_SELECTION : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()),set_campus_selection_state)],
             SET_SUBLOCATION : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()),set_sublocation_state)],
             SET_DAY : [MessageHandler(Filters.regex(regex.date_regex()) | Filters.regex(regex.date_string_regex()), set_day_state )],
             SET_START_TIME : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()),set_start_time_state)],
-            SET_END_AND_SEND : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()), end_state)],
+            SET_END_AND_SEND : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()), end_state , run_async=True)],
             SETTINGS : [MessageHandler(Filters.regex(regex.settings_regex()) , settings)],
             SET_LANG : [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()) , set_language)],
             SET_CAMPUS: [MessageHandler(Filters.text & ~Filters.command & ~Filters.regex(regex.cancel_command()) , set_campus)],
@@ -702,6 +916,7 @@ def main():
 
     dispatcher.add_error_handler(errorhandler.error_handler)
     dispatcher.add_handler(conv_handler)
+    dispatcher.add_handler(CallbackQueryHandler(show_page , pattern='^page:' , run_async=True))
 
     # Heartbeat job
     def heartbeat(context: CallbackContext):
@@ -711,9 +926,72 @@ def main():
 
     updater.job_queue.run_repeating(heartbeat, interval=30, first=1)
 
-    updater.start_polling()
+    # Keep the occupancy cache warm for the days offered by the day keyboard
+    prefetcher = Prefetcher(location_dict)
+    updater.job_queue.run_repeating(prefetcher.run, interval=PREFETCH_INTERVAL, first=10)
+
+    # Render the "Now" answers at every quarter hour
+    updater.job_queue.run_once(NOW_ANSWERS.refresh, 15)
+    updater.job_queue.run_repeating(NOW_ANSWERS.refresh, interval=NOW_INTERVAL, first=NOW_INTERVAL - time.time() % NOW_INTERVAL + 1)
+
+    # One shared evaluation of every /watch subscription
+    updater.job_queue.run_repeating(check_watches, interval=watch_handler.WATCH_INTERVAL, first=watch_handler.WATCH_INTERVAL)
+    on_schedule_change(recheck_watches(updater.job_queue))
+
+    # Forget the inactive users, on disk and in memory
+    def compact_users(context: CallbackContext):
+        def forget(users , conversations):
+            for user_id in users:
+                context.dispatcher.user_data.pop(user_id , None)
+                context.dispatcher.chat_data.pop(user_id , None)
+            for _ , key in conversations:
+                conv_handler.conversations.pop(key , None)
+
+        pp.compact(INACTIVE_USER_DAYS * 86400 , user_data_handler.has_default_preferences , USER_ARCHIVE_PATH , forget)
 
-    updater.idle()
+    updater.job_queue.run_repeating(compact_users, interval=COMPACT_INTERVAL, first=COMPACT_INTERVAL)
+
+    # Drop long expired pages from the page cache and log its stats
+    updater.job_queue.run_repeating(page_store.vacuum, interval=PAGE_STORE_VACUUM_INTERVAL, first=PAGE_STORE_VACUUM_INTERVAL)
+
+    if WEBHOOK_URL:
+        path = WEBHOOK_PATH or TOKEN
+        updater.start_webhook(listen=WEBHOOK_LISTEN , port=WEBHOOK_PORT , url_path=path , webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{path}" , max_connections=WEBHOOK_MAX_CONNECTIONS)
+        logging.info("Webhook listening on %s:%d" , WEBHOOK_LISTEN , WEBHOOK_PORT)
+    else:
+        updater.start_polling()
+
+    serve(updater)
+
+
+def serve(updater):
+    """Blocks until SIGINT or SIGTERM, then shuts the bot down gracefully.
+
+    No more updates are received, the queued ones are handled (for at most
+    DRAIN_TIMEOUT seconds), then the jobs, the dispatcher and the persistence stop.
+
+    Args:
+        updater (Updater): The started updater.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGINT , signal.SIGTERM):
+        signal.signal(signum , lambda signum , frame: stop.set())
+    while not stop.wait(1):
+        pass
+
+    logging.info("Shutting down, draining %d queued updates" , updater.update_queue.qsize())
+    if updater.httpd:
+        # refuse new webhook calls first, Telegram retries the updates it could not deliver
+        updater.httpd.shutdown()
+        updater.httpd = None
+    deadline = time.time() + DRAIN_TIMEOUT
+    while not updater.update_queue.empty() and time.time() < deadline:
+        time.sleep(0.1)
+    updater.stop()
+    if updater.persistence:
+        updater.dispatcher.update_persistence()
+        updater.persistence.flush()
+    logging.info("Stopped")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -5,6 +5,7 @@ import pytz
 from datetime import datetime , timedelta
 from search.find_classrooms import MAX_TIME , MIN_TIME
 import logging
+from telegram import InlineKeyboardButton
 
 class KeyboadBuilder:
     """Helper class to build custom ReplyKeyboards for the bot."""
@@ -131,4 +132,23 @@ class KeyboadBuilder:
         """
         return [[self.texts[lang]["keyboards"]["cancel"]]] + [[x] for x in range(1 , 9)]
 
+    def pager_keyboard(self, lang, token, page, pages):
+        """Generates the inline buttons browsing the pages of a result.
 
+        Page 0 is the summary, which only offers to show the rooms.
+
+        Args:
+            lang (str): The language code.
+            token (str): The token of the pages (see string_builder.store_pages).
+            page (int): The page shown.
+            pages (int): The number of pages.
+
+        Returns:
+            list: The list of button rows for the inline keyboard.
+        """
+        if page == 0:
+            return [[InlineKeyboardButton(self.texts[lang]["keyboards"]["show_more"].format(pages - 1) , callback_data=f"page:{token}:1")]]
+        row = [InlineKeyboardButton("◀" , callback_data=f"page:{token}:{page - 1}")]
+        if page < pages - 1:
+            row.append(InlineKeyboardButton(f"{page}/{pages - 1} ▶" , callback_data=f"page:{token}:{page + 1}"))
+        return [row]
@@ -0,0 +1,107 @@
+"""
+This module precomputes the answers of the "Now" quick search.
+
+Every quarter hour, NowCache renders the free rooms of the current window for
+every campus, duration, format mode and language, so that the `now` handler
+only looks the answer up and sends it.
+"""
+import time
+import logging
+import pytz
+from datetime import datetime
+from search.find_classrooms import MIN_TIME , MAX_TIME , TIME_SHIFT , load_day , is_stale , data_version
+from search.free_classroom import free_rooms_of_day
+from functions import string_builder
+
+NOW_INTERVAL = 900 # seconds between two refreshes, aligned on the quarter hours
+NOW_DURATIONS = range(1, 9) # the durations accepted by input_check.time_check
+FORMAT_MODES = ('text', 'emoji')
+
+
+def now_window(duration, now=None):
+    """Returns the search window of the "Now" quick search.
+
+    Args:
+        duration (int): The search duration in hours, from the preferences.
+        now (datetime, optional): The current time in Europe/Rome. Defaults to now.
+
+    Returns:
+        tuple: (date, start_time, end_time, closed), where 'closed' is True outside
+               the opening hours, when the window starts at MIN_TIME instead.
+    """
+    now = now or datetime.now(pytz.timezone('Europe/Rome'))
+    start_time = now.hour
+    closed = start_time >= MAX_TIME or start_time < MIN_TIME
+    if closed:
+        start_time = MIN_TIME
+    end_time = start_time + duration if start_time + duration < MAX_TIME else MAX_TIME
+    return now.strftime("%d/%m/%Y") , start_time , end_time , closed
+
+
+class NowCache:
+    """The rendered "Now" answers of the current quarter hour."""
+
+    def __init__(self, texts, location_dict):
+        """Initializes an empty cache.
+
+        Args:
+            texts (dict): The localized texts, by language.
+            location_dict (dict): The dictionary loaded from json/location.json.
+        """
+        self.texts = texts
+        self.location_dict = location_dict
+        self.updated_at = 0
+        self._answers = {} # (campus, date, start_time, end_time, format_mode, lang) -> (header, Results)
+
+    def refresh(self, context=None):
+        """Renders every answer of the current window. Can be scheduled on the job queue.
+
+        Args:
+            context (CallbackContext, optional): The job context (unused).
+        """
+        start = time.time()
+        answers = {}
+        windows = {duration : now_window(duration) for duration in NOW_DURATIONS}
+        date , start_time , _ , _ = windows[NOW_DURATIONS[0]]
+        day , month , year = date.split('/')
+        for campus in self.location_dict:
+            try:
+                parsed = load_day(self.location_dict[campus]["code"] , int(day) , int(month) , int(year))
+            except Exception as e:
+                logging.warning("Now answers of %s not computed: %s" , campus , e)
+                continue
+            stale_since = parsed.fetched_at if is_stale(parsed) else None
+            version = data_version(parsed)
+            for end_time in sorted({window[2] for window in windows.values()}):
+                available_rooms = None
+                for lang in self.texts:
+                    header = string_builder.header_str(date , campus , start_time , end_time , self.texts[lang]["texts"] , stale_since)
+                    for format_mode in FORMAT_MODES:
+                        # shared with end_state, so that unchanged days are not rendered again
+                        cache_key = (self.location_dict[campus]["code"] , date , start_time , end_time , format_mode , lang , version)
+                        results = string_builder.get_rendered(cache_key)
+                        if results is None:
+                            if available_rooms is None:
+                                available_rooms = free_rooms_of_day(parsed , float(start_time + TIME_SHIFT) , float(end_time + TIME_SHIFT))
+                            results = string_builder.render_results(available_rooms , self.texts[lang]["texts"] , format_mode , cache_key)
+                        answers[(campus , date , start_time , end_time , format_mode , lang)] = (header , results)
+        self._answers = answers
+        self.updated_at = time.time()
+        logging.info("Precomputed %d now answers in %.2fs" , len(answers) , self.updated_at - start)
+
+    def get(self, campus, duration, format_mode, lang):
+        """Looks up the answer of a "Now" search.
+
+        Args:
+            campus (str): The campus name, from the preferences.
+            duration (int): The search duration in hours.
+            format_mode (str): The display format ('text' or 'emoji').
+            lang (str): The language code.
+
+        Returns:
+            tuple: (header, Results), or None if the answer is missing or outdated.
+        """
+        if time.time() - self.updated_at > 2 * NOW_INTERVAL:
+            return None
+        date , start_time , end_time , _ = now_window(duration)
+        return self._answers.get((campus , date , start_time , end_time , format_mode , lang))
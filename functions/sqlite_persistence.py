@@ -0,0 +1,315 @@
+"""
+This module provides the SQLitePersistence class, the persistence of the bot.
+
+PicklePersistence rewrites every user and conversation on each flush. Here each
+user, chat and conversation is a row of a SQLite file in WAL mode, and a row is
+written only when its content changed since it was last stored, so handling an
+update costs the I/O of that user alone.
+
+Users inactive for longer than INACTIVE_USER_DAYS are removed by compact,
+scheduled daily by the bot or run offline with the bot stopped:
+    python -m functions.sqlite_persistence data/aulelibere.sqlite [days] [archive.sqlite]
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import defaultdict , namedtuple
+from os.path import dirname
+from apscheduler.events import EVENT_JOB_EXECUTED , EVENT_JOB_ERROR
+from telegram.ext import BasePersistence
+
+INACTIVE_USER_DAYS = int(os.environ.get("INACTIVE_USER_DAYS", 180)) # days without updates after which a user is removed
+USER_ARCHIVE_PATH = os.environ.get("USER_ARCHIVE_PATH", "") # SQLite file receiving the removed users, empty to drop them
+COMPACT_INTERVAL = 86400 # seconds between two compactions
+DEFAULT_USER_IDLE = 86400 # seconds without updates after which a user holding only default data is removed
+LAST_SEEN_RESOLUTION = 3600 # seconds, last_seen is written at most once per period and user
+
+"""
+The result of a compaction: the removed user ids, the removed conversation
+states as (name, key) pairs, and the bytes reclaimed on disk.
+"""
+Compaction = namedtuple('Compaction', ['users', 'conversations', 'reclaimed'])
+
+
+def _dumps(data):
+    return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+
+def _digest(blob):
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+def save_bot_data_after_jobs(job_queue, persistence):
+    """Makes the JobQueue save only bot_data after each job.
+
+    The JobQueue saves the data of every user and chat after each job run, which
+    pickles all of them at every heartbeat. The jobs of the bot change bot_data
+    alone, and the handlers save their own user when an update is processed.
+
+    Args:
+        job_queue (telegram.ext.JobQueue): The JobQueue of the Updater.
+        persistence (BasePersistence): The persistence of the Updater.
+    """
+    dispatcher = job_queue._dispatcher
+    job_queue.scheduler.remove_listener(job_queue._update_persistence)
+    job_queue.scheduler.add_listener(lambda event: persistence.update_bot_data(dispatcher.bot_data), EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores user_data, chat_data, bot_data and conversation states in SQLite, row by row."""
+
+    def __init__(self, path, migrate_from=None, store_user_data=True, store_chat_data=True, store_bot_data=True):
+        """Opens (or creates) the database, importing a PicklePersistence file on first start.
+
+        Args:
+            path (str): The SQLite file.
+            migrate_from (str, optional): A single-file PicklePersistence to import when the
+                database is empty. It is renamed with a '.migrated' suffix once imported.
+            store_user_data (bool, optional): Whether user_data is persisted. Defaults to True.
+            store_chat_data (bool, optional): Whether chat_data is persisted. Defaults to True.
+            store_bot_data (bool, optional): Whether bot_data is persisted. Defaults to True.
+        """
+        super().__init__(store_user_data=store_user_data, store_chat_data=store_chat_data, store_bot_data=store_bot_data)
+        if dirname(path):
+            os.makedirs(dirname(path), exist_ok=True)
+        self.path = path
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._digests = {} # (table, key) -> digest of the stored row
+        self._last_seen = {} # user id -> stored last_seen
+        self._seen = {} # user id -> epoch of the last update, not stored yet
+        self._removed = set() # ids removed by the last compaction, not written back until they send an update
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS user_data (id INTEGER PRIMARY KEY, data BLOB, last_seen REAL)")
+        if 'last_seen' not in [column[1] for column in self._db.execute("PRAGMA table_info(user_data)")]:
+            self._db.execute("ALTER TABLE user_data ADD COLUMN last_seen REAL")
+        # users stored before last_seen was tracked count as seen now
+        self._db.execute("UPDATE user_data SET last_seen = ? WHERE last_seen IS NULL", (time.time(),))
+        self._db.execute("CREATE TABLE IF NOT EXISTS chat_data (id INTEGER PRIMARY KEY, data BLOB)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bot_data (id INTEGER PRIMARY KEY, data BLOB)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS conversations (name TEXT, key TEXT, state BLOB, PRIMARY KEY (name, key))")
+        if migrate_from and os.path.exists(migrate_from) and self._is_empty():
+            self.migrate(migrate_from)
+
+    def _is_empty(self):
+        """Checks whether nothing was ever stored."""
+        return not any(self._db.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() for table in ('user_data', 'chat_data', 'bot_data', 'conversations'))
+
+    def migrate(self, filename):
+        """Imports a single-file PicklePersistence, then renames it.
+
+        Args:
+            filename (str): The pickle file.
+        """
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        with self._lock:
+            self._db.execute("BEGIN")
+            for user_id, user_data in data.get('user_data', {}).items():
+                self._put('user_data', user_id, user_data)
+            for chat_id, chat_data in data.get('chat_data', {}).items():
+                self._put('chat_data', chat_id, chat_data)
+            if data.get('bot_data'):
+                self._put('bot_data', 0, data['bot_data'])
+            for name, conversations in data.get('conversations', {}).items():
+                for key, state in conversations.items():
+                    self._put_conversation(name, key, state)
+            self._db.execute("COMMIT")
+        os.replace(filename, filename + '.migrated')
+        logging.info("Migrated %s: %d users, %d conversations", filename, len(data.get('user_data', {})),
+                     sum(len(conversations) for conversations in data.get('conversations', {}).values()))
+
+    def _put(self, table, key, data):
+        """Writes a row if its content changed. Must be called with the lock held.
+
+        Returns:
+            bool: True if the row was written.
+        """
+        blob = _dumps(data)
+        digest = _digest(blob)
+        if self._digests.get((table, key)) == digest:
+            return False
+        if table == 'user_data':
+            self._db.execute("INSERT INTO user_data VALUES (?, ?, ?) ON CONFLICT (id) DO UPDATE SET data = excluded.data", (key, blob, time.time()))
+        else:
+            self._db.execute(f"INSERT OR REPLACE INTO {table} VALUES (?, ?)", (key, blob))
+        self._digests[(table, key)] = digest
+        self.writes += 1
+        return True
+
+    def _put_conversation(self, name, key, state):
+        """Writes or, when the conversation ended, deletes a conversation state. Must be called with the lock held."""
+        row = json.dumps(list(key))
+        if state is None:
+            self._db.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, row))
+            self._digests.pop(('conversations', name, row), None)
+            return
+        blob = _dumps(state)
+        digest = _digest(blob)
+        if self._digests.get(('conversations', name, row)) == digest:
+            return
+        self._db.execute("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)", (name, row, blob))
+        self._digests[('conversations', name, row)] = digest
+        self.writes += 1
+
+    def _load(self, table):
+        """Reads every row of a table, remembering their digests."""
+        rows = {}
+        with self._lock:
+            for key, blob in self._db.execute(f"SELECT id, data FROM {table}").fetchall():
+                self._digests[(table, key)] = _digest(blob)
+                rows[key] = pickle.loads(blob)
+        return rows
+
+    def get_user_data(self):
+        with self._lock:
+            self._last_seen = dict(self._db.execute("SELECT id, last_seen FROM user_data"))
+        return defaultdict(dict, self._load('user_data'))
+
+    def get_chat_data(self):
+        return defaultdict(dict, self._load('chat_data'))
+
+    def get_bot_data(self):
+        return self._load('bot_data').get(0, {})
+
+    def get_conversations(self, name):
+        conversations = {}
+        with self._lock:
+            for row, blob in self._db.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)):
+                self._digests[('conversations', name, row)] = _digest(blob)
+                conversations[tuple(json.loads(row))] = pickle.loads(blob)
+        return conversations
+
+    def update_conversation(self, name, key, new_state):
+        with self._lock:
+            self._put_conversation(name, key, new_state)
+
+    def refresh_user_data(self, user_id, user_data):
+        """Called before a handler receives an update of the user: records the activity, without I/O."""
+        self._seen[user_id] = time.time()
+        self._removed.discard(user_id)
+
+    def refresh_chat_data(self, chat_id, chat_data):
+        self._removed.discard(chat_id)
+
+    def update_user_data(self, user_id, data):
+        with self._lock:
+            if user_id in self._removed:
+                return # a job saving every user, not an update of this one
+            self._put('user_data', user_id, data)
+            seen = self._seen.pop(user_id, None)
+            if seen is not None and seen - (self._last_seen.get(user_id) or 0) >= LAST_SEEN_RESOLUTION:
+                self._db.execute("UPDATE user_data SET last_seen = ? WHERE id = ?", (seen, user_id))
+                self._last_seen[user_id] = seen
+
+    def update_chat_data(self, chat_id, data):
+        with self._lock:
+            if chat_id in self._removed:
+                return
+            self._put('chat_data', chat_id, data)
+
+    def update_bot_data(self, data):
+        with self._lock:
+            self._put('bot_data', 0, data)
+
+    def compact(self, max_idle, is_default=None, archive=None, on_remove=None):
+        """Removes the inactive users, their chat data and their conversation states, then compacts the file.
+
+        Args:
+            max_idle (float): Seconds without updates after which a user is removed.
+            is_default (callable, optional): Called with the user_data of a user, returns True
+                if it only holds defaults; such users are removed after DEFAULT_USER_IDLE seconds.
+            archive (str, optional): A SQLite file where the removed rows are copied. Defaults to dropping them.
+            on_remove (callable, optional): Called with the user ids and the (name, key) conversation
+                pairs before they are deleted, with the lock held, e.g. to drop them from the dispatcher.
+
+        Returns:
+            Compaction: The removed users and conversation states, and the bytes reclaimed.
+        """
+        now = time.time()
+        with self._lock:
+            before = self._file_size()
+            users = []
+            for user_id, blob, last_seen in self._db.execute("SELECT id, data, last_seen FROM user_data").fetchall():
+                idle = now - max(last_seen or 0, self._seen.get(user_id, 0))
+                if idle > max_idle or (is_default is not None and idle > DEFAULT_USER_IDLE and is_default(pickle.loads(blob))):
+                    users.append(user_id)
+            removed = set(users)
+            conversations = [(name, row) for name, row in self._db.execute("SELECT name, key FROM conversations").fetchall()
+                             if removed.intersection(json.loads(row))]
+            # the dispatcher may still save them after a job: ignore them until they come back
+            self._removed = removed
+            if on_remove is not None:
+                on_remove(users, [(name, tuple(json.loads(row))) for name, row in conversations])
+
+            if archive:
+                self._db.execute("ATTACH DATABASE ? AS archive", (archive,)) # not allowed inside a transaction
+            self._db.execute("BEGIN")
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS removed (id INTEGER PRIMARY KEY)")
+            self._db.execute("DELETE FROM removed")
+            self._db.executemany("INSERT INTO removed VALUES (?)", [(user_id,) for user_id in users])
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS removed_conversations (name TEXT, key TEXT)")
+            self._db.execute("DELETE FROM removed_conversations")
+            self._db.executemany("INSERT INTO removed_conversations VALUES (?, ?)", conversations)
+            if archive:
+                self._archive()
+            self._db.execute("DELETE FROM user_data WHERE id IN (SELECT id FROM removed)")
+            self._db.execute("DELETE FROM chat_data WHERE id IN (SELECT id FROM removed)") # private chats share the user id
+            self._db.execute("DELETE FROM conversations WHERE (name, key) IN (SELECT name, key FROM removed_conversations)")
+            self._db.execute("COMMIT")
+            if archive:
+                self._db.execute("DETACH DATABASE archive")
+            self._db.execute("VACUUM")
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            reclaimed = before - self._file_size()
+
+            for user_id in users:
+                self._digests.pop(('user_data', user_id), None)
+                self._digests.pop(('chat_data', user_id), None)
+                self._last_seen.pop(user_id, None)
+                self._seen.pop(user_id, None)
+            for name, row in conversations:
+                self._digests.pop(('conversations', name, row), None)
+
+        logging.info("Persistence compaction: %d users and %d conversations %s, %d bytes reclaimed",
+                     len(users), len(conversations), "archived" if archive else "removed", reclaimed)
+        return Compaction(users, [(name, tuple(json.loads(row))) for name, row in conversations], reclaimed)
+
+    def _archive(self):
+        """Copies the rows being removed to the attached archive. Must be called with the lock held."""
+        self._db.execute("CREATE TABLE IF NOT EXISTS archive.user_data (id INTEGER PRIMARY KEY, data BLOB, last_seen REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS archive.chat_data (id INTEGER PRIMARY KEY, data BLOB)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS archive.conversations (name TEXT, key TEXT, state BLOB, PRIMARY KEY (name, key))")
+        self._db.execute("INSERT OR REPLACE INTO archive.user_data SELECT * FROM user_data WHERE id IN (SELECT id FROM removed)")
+        self._db.execute("INSERT OR REPLACE INTO archive.chat_data SELECT * FROM chat_data WHERE id IN (SELECT id FROM removed)")
+        self._db.execute("INSERT OR REPLACE INTO archive.conversations SELECT * FROM conversations WHERE (name, key) IN (SELECT name, key FROM removed_conversations)")
+
+    def _file_size(self):
+        return sum(os.path.getsize(self.path + suffix) for suffix in ('', '-wal') if os.path.exists(self.path + suffix))
+
+    def flush(self):
+        """Checkpoints the WAL into the database file, called by the Updater on stop."""
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        logging.info("Persistence flushed: %d rows written since startup", self.writes)
+
+
+if __name__ == "__main__":
+    """
+    Offline compaction, with the bot stopped:
+        python -m functions.sqlite_persistence data/aulelibere.sqlite [days] [archive.sqlite]
+    """
+    from functions.user_data_handler import has_default_preferences
+
+    logging.basicConfig(level=logging.INFO)
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else INACTIVE_USER_DAYS
+    result = SQLitePersistence(sys.argv[1]).compact(days * 86400, has_default_preferences, sys.argv[3] if len(sys.argv) > 3 else USER_ARCHIVE_PATH)
+    print(f"{len(result.users)} users and {len(result.conversations)} conversations removed, {result.reclaimed} bytes reclaimed")
@@ -1,35 +1,248 @@
+import pytz
+import secrets
+from datetime import datetime
+from collections import namedtuple
 from telegram.constants import MAX_MESSAGE_LENGTH
 from functions import formatter
+from search.cache import TTLCache
 
+RENDER_CACHE_SIZE = 1024 # rendered searches kept in memory, the Now answers included
+RENDER_CACHE_TTL = 3600 # seconds, entries are also invalidated by the data version in their key
+HEADER_RESERVE = 256 # characters left free in the first message for the header of the search
 
-def room_builder_str(available_rooms, texts, format_mode='text'):
+"""
+The rendered results of a search: a compact summary and the room messages.
+"""
+Results = namedtuple('Results', ['summary', 'messages'])
+
+PAGES_CACHE_SIZE = 4096 # paged results kept for the "show more" buttons
+PAGES_TTL = 86400 # seconds a paged result can be browsed
+
+_rendered = TTLCache(RENDER_CACHE_SIZE , RENDER_CACHE_TTL) # search -> Results
+_pages = TTLCache(PAGES_CACHE_SIZE , PAGES_TTL) # token -> pages
+
+
+def header_str(date, location_name, start_time, end_time, texts, stale_since=None):
+    """Builds the header sent before the results of a search.
+
+    Args:
+        date (str): The day of the search (DD/MM/YYYY).
+        location_name (str): The name of the location.
+        start_time (int): The starting hour.
+        end_time (int): The ending hour.
+        texts (dict): A dictionary of localized text strings.
+        stale_since (float, optional): The epoch at which the data was downloaded, if it is stale.
+
+    Returns:
+        str: The HTML header.
+    """
+    header = f"📅 <b>{date}</b>\n📍 <b>{location_name}</b>\n⏰ <b>{start_time}:00 - {end_time}:00</b>"
+    if stale_since is not None:
+        # served from the cache while PoliMi is slow or down
+        header += "\n" + texts["stale"].format(datetime.fromtimestamp(stale_since , pytz.timezone('Europe/Rome')).strftime('%H:%M'))
+    return header
+
+
+def get_rendered(cache_key):
+    """Returns the results rendered for a search, if they are still cached.
+
+    Args:
+        cache_key (tuple): (location, date, start_time, end_time, format_mode, lang, data version),
+            the data version being the digest of the parsed day (see find_classrooms.data_version).
+
+    Returns:
+        Results: The rendered results, or None on a miss.
+    """
+    return _rendered.get(cache_key)
+
+
+def render_results(available_rooms, texts, format_mode='text', cache_key=None):
+    """Renders the results of a search: the room messages and their compact summary.
+
+    The first message leaves HEADER_RESERVE characters free, so that the header
+    of the search can be sent along with it.
+
+    Args:
+        available_rooms (dict): A dictionary where keys are building names and values are lists of FreeRoom.
+        texts (dict): A dictionary of localized text strings.
+        format_mode (str, optional): The display format ('text' or 'emoji'). Defaults to 'text'.
+        cache_key (tuple, optional): If given, the result is stored under this key (see get_rendered).
+
+    Returns:
+        Results: The summary and the messages.
+    """
+    results = Results(summary_str(available_rooms, texts), room_builder_str(available_rooms, texts, format_mode, HEADER_RESERVE))
+    if cache_key is not None:
+        _rendered.put(cache_key, results)
+    return results
+
+
+def summary_str(available_rooms, texts):
+    """Builds a compact summary of the results: the number of free rooms of each building.
+
+    Args:
+        available_rooms (dict): A dictionary where keys are building names and values are lists of FreeRoom.
+        texts (dict): A dictionary of localized text strings.
+
+    Returns:
+        str: The HTML summary, within MAX_MESSAGE_LENGTH minus HEADER_RESERVE.
+    """
+    total = sum(len(rooms) for rooms in available_rooms.values())
+    lines = [texts["summary"].format(total, len(available_rooms))]
+    size = len(lines[0])
+    for building, rooms in available_rooms.items():
+        line = '<b>{}</b> · {}'.format(building, len(rooms))
+        if size + 1 + len(line) > MAX_MESSAGE_LENGTH - HEADER_RESERVE - 2:
+            lines.append('…')
+            break
+        lines.append(line)
+        size += 1 + len(line)
+    return '\n'.join(lines)
+
+
+def room_builder_str(available_rooms, texts, format_mode='text', reserve=0):
     """Parses the list of available classrooms and generates a list of formatted strings.
 
-    The output is split into multiple strings if necessary to respect the Telegram
-    message length limit.
+    The output is split into multiple strings, at room boundaries, so that none
+    exceeds the Telegram message length limit (see pack_messages).
 
     Args:
-        available_rooms (dict): A dictionary where keys are building names and values are lists of room dictionaries.
+        available_rooms (dict): A dictionary where keys are building names and values are lists of FreeRoom.
         texts (dict): A dictionary of localized text strings.
         format_mode (str, optional): The display format ('text' or 'emoji'). Defaults to 'text'.
+        reserve (int, optional): The characters to leave free in the first message. Defaults to 0.
 
     Returns:
         list: A list of formatted strings ready to be sent as messages.
     """
-    if not available_rooms:
-        return []
-    
-    splitted_msg = []
-    available_rooms_str = ""
+    buildings = []
     for building in available_rooms:
-        if  MAX_MESSAGE_LENGTH - len(available_rooms_str) <= 50:
-            splitted_msg.append(available_rooms_str)
-            available_rooms_str = ""
-        available_rooms_str += '\n<b>{}</b>\n'.format(building)
-        for room in available_rooms[building]:
-            available_rooms_str += formatter.format_room(room, room['until'], format_mode, texts)
-    
-    if available_rooms_str:
-        splitted_msg.append(available_rooms_str)
-        
-    return splitted_msg
\ No newline at end of file
+        lines = [formatter.format_room(room, room.until, format_mode, texts) for room in available_rooms[building]]
+        buildings.append(('\n<b>{}</b>\n'.format(building), lines))
+    return pack_messages(buildings, reserve)
+
+
+def pack_messages(buildings, reserve=0):
+    """Packs the rendered buildings into as few messages as possible.
+
+    Two packings are computed, and the one with fewer messages is returned:
+        - buildings kept whole where they fit, placed first fit decreasing;
+        - rooms filled in order, splitting buildings between messages.
+    The first one is preferred on a tie, as it splits fewer buildings. A split
+    building has its title repeated at the top of each part.
+
+    Args:
+        buildings (list): (title, room lines) pairs, in display order.
+        reserve (int, optional): The characters to leave free in the first message. Defaults to 0.
+
+    Returns:
+        list: The messages, none longer than MAX_MESSAGE_LENGTH.
+    """
+    whole = _first_fit(buildings, reserve)
+    filled = _fill(buildings, reserve)
+    return whole if len(whole) <= len(filled) else filled
+
+
+def _split(title, lines, limit):
+    """Splits a building in parts of at most `limit` characters, at room boundaries."""
+    parts = []
+    part = [title]
+    size = len(title)
+    for line in lines:
+        if len(part) > 1 and size + len(line) > limit:
+            parts.append(part)
+            part = [title]
+            size = len(title)
+        part.append(line)
+        size += len(line)
+    parts.append(part)
+    return [''.join(part) for part in parts]
+
+
+def _first_fit(buildings, reserve):
+    """Places whole buildings (or parts of the oversized ones) first fit decreasing, keeping the display order in each message."""
+    items = []
+    for i, (title, lines) in enumerate(buildings):
+        if lines:
+            items.extend(((i, j), part) for j, part in enumerate(_split(title, lines, MAX_MESSAGE_LENGTH - reserve)))
+    bins = [] # [free characters, items]
+    for item in sorted(items, key=lambda item: len(item[1]), reverse=True):
+        for b in bins:
+            if len(item[1]) <= b[0]:
+                b[0] -= len(item[1])
+                b[1].append(item)
+                break
+        else:
+            bins.append([MAX_MESSAGE_LENGTH - len(item[1]) - (0 if bins else reserve), [item]])
+    # the first bin holds the reserve, the others follow the order of their first building
+    bins = bins[:1] + sorted(bins[1:], key=lambda b: min(b[1]))
+    return [''.join(part for _, part in sorted(b[1])) for b in bins]
+
+
+def _fill(buildings, reserve):
+    """Fills the messages room by room, in display order."""
+    messages = []
+    chunk = []
+    size = reserve
+    for title, lines in buildings:
+        pending = title
+        for line in lines:
+            if chunk and size + len(pending) + len(line) > MAX_MESSAGE_LENGTH:
+                messages.append(''.join(chunk))
+                chunk = []
+                size = 0
+                pending = title
+            if pending:
+                chunk.append(pending)
+                size += len(pending)
+                pending = ''
+            chunk.append(line)
+            size += len(line)
+
+    if chunk:
+        messages.append(''.join(chunk))
+    return messages
+
+
+def store_pages(pages):
+    """Keeps the pages of a result for the "show more" buttons.
+
+    Args:
+        pages (list): The page strings (e.g., the summary followed by the messages).
+
+    Returns:
+        str: The token of the pages, short enough for the callback data.
+    """
+    token = secrets.token_urlsafe(6)
+    _pages.put(token, pages)
+    return token
+
+
+def get_pages(token):
+    """Returns the pages stored by store_pages.
+
+    Args:
+        token (str): The token of the pages.
+
+    Returns:
+        list: The pages, or None if they expired.
+    """
+    return _pages.get(token)
+
+
+def join_messages(parts):
+    """Merges consecutive message parts as long as they fit in a single Telegram message.
+
+    Args:
+        parts (list): The message strings, in order.
+
+    Returns:
+        list: The merged messages.
+    """
+    messages = []
+    for part in parts:
+        if messages and len(messages[-1]) + 1 + len(part) <= MAX_MESSAGE_LENGTH:
+            messages[-1] += '\n' + part
+        else:
+            messages.append(part)
+    return messages
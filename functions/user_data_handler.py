@@ -1,4 +1,50 @@
+"""
+This module manages the data kept for each user.
+
+Only the preferences (lang, campus, time, format) live in context.user_data and
+are persisted. The steps of a search in progress (location, date, start time...)
+live in an in-memory session, evicted after SESSION_TTL seconds of inactivity,
+so abandoned searches are neither persisted nor kept forever.
+"""
+from telegram import Update
 from telegram.ext import  CallbackContext
+from search.cache import TTLCache
+
+SESSION_TTL = 1800 # seconds a search in progress is kept after its last step
+SESSION_SIZE = 10000 # searches in progress kept in memory
+
+DEFAULT_PREFERENCES = {'lang' : 'en' , 'time' : 2 , 'format' : 'text'}
+
+_sessions = TTLCache(SESSION_SIZE , SESSION_TTL) # user id -> search in progress
+
+
+def get_session(update: Update):
+    """Returns the search in progress of the user of an update.
+
+    Every call extends the session by SESSION_TTL seconds.
+
+    Args:
+        update (Update): The Telegram update object.
+
+    Returns:
+        dict: The search steps (e.g., 'location', 'date', 'start_time'), empty if the session expired.
+    """
+    user_id = update.effective_user.id
+    session = _sessions.get(user_id)
+    if session is None:
+        session = {}
+    _sessions.put(user_id , session)
+    return session
+
+
+def clear_session(update: Update):
+    """Drops the search in progress of the user of an update.
+
+    Args:
+        update (Update): The Telegram update object.
+    """
+    _sessions.invalidate(update.effective_user.id)
+
 
 def get_lang(context:CallbackContext):
     """Retrieves the user's language preference.
@@ -30,23 +76,21 @@ def initialize_user_data(context: CallbackContext):
     """
     if "preference" not in context.user_data:
         context.user_data.clear()
-        lang = 'en' # Default language    
-        context.user_data['preference'] = {} # set the default language
-        context.user_data['preference']['lang'] = lang
-        context.user_data['preference']['time'] = 2
-        context.user_data['preference']['format'] = 'text'
+        context.user_data['preference'] = dict(DEFAULT_PREFERENCES)
 
     return get_lang(context)
 
 
-def reset_user_data(context: CallbackContext):
-    """Resets user data related to search while preserving preferences.
+def reset_user_data(update: Update , context: CallbackContext):
+    """Drops the search in progress while preserving preferences.
 
     Args:
+        update (Update): The Telegram update object.
         context (CallbackContext): The context object containing user data.
     """
+    clear_session(update)
     if 'preference' in context.user_data:
-        # Delete the search selection
+        # Delete anything else, e.g. the search steps stored by older versions
         preference = context.user_data['preference']
         context.user_data.clear()
         context.user_data['preference'] = preference
@@ -63,7 +107,7 @@ def update_lang(lang , context:CallbackContext):
         context (CallbackContext): The context object containing user data.
     """
     if  "preference" not in context.user_data:
-        reset_user_data(context)
+        initialize_user_data(context)
     context.user_data['preference']['lang'] = lang
 
 def update_campus(campus , context:CallbackContext):
@@ -74,7 +118,7 @@ def update_campus(campus , context:CallbackContext):
         context (CallbackContext): The context object containing user data.
     """
     if  "preference" not in context.user_data:
-        reset_user_data(context)
+        initialize_user_data(context)
     context.user_data['preference']['campus'] = campus
 
 def update_time(time , context:CallbackContext):
@@ -85,7 +129,7 @@ def update_time(time , context:CallbackContext):
         context (CallbackContext): The context object containing user data.
     """
     if  "preference" not in context.user_data:
-        reset_user_data(context)
+        initialize_user_data(context)
     context.user_data['preference']['time'] = int(time)
 
 def update_format(mode , context:CallbackContext):
@@ -96,7 +140,7 @@ def update_format(mode , context:CallbackContext):
         context (CallbackContext): The context object containing user data.
     """
     if  "preference" not in context.user_data:
-        reset_user_data(context)
+        initialize_user_data(context)
     context.user_data['preference']['format'] = mode
 
 def get_format_mode(context:CallbackContext):
@@ -134,4 +178,16 @@ def get_user_preferences(context:CallbackContext):
     except Exception:
         pass
     
-    return loc , time
\ No newline at end of file
+    return loc , time
+
+
+def has_default_preferences(user_data):
+    """Checks whether a user only holds the default preferences, so can be forgotten.
+
+    Args:
+        user_data (dict): The user data.
+
+    Returns:
+        bool: True if nothing was customized.
+    """
+    return not user_data or user_data == {'preference' : DEFAULT_PREFERENCES}
@@ -0,0 +1,127 @@
+"""
+This module manages the /watch subscriptions, stored in bot_data.
+
+A subscription asks to be notified when a room becomes free in a location, on
+a day, during a time window. Subscriptions are grouped by (location, date) so
+that a single job evaluates all of them against one cached page.
+"""
+import threading
+import pytz
+from datetime import datetime
+from telegram.ext import CallbackContext
+from search.find_classrooms import TIME_SHIFT
+
+MAX_WATCHES = 3 # subscriptions per user
+WATCH_INTERVAL = 300 # seconds between two evaluations of the subscriptions
+NOTIFY_RATE = 20 # users notified per second at most, below the Telegram broadcast limit
+
+_lock = threading.Lock() # handlers and the job queue run on different threads
+
+
+def add_watch(context: CallbackContext, chat_id, watch):
+    """Adds a subscription for a chat.
+
+    Args:
+        context (CallbackContext): The callback context.
+        chat_id (int): The chat to notify.
+        watch (dict): The subscription: location, location_name, date, start_time,
+            end_time, lang, format and free (the rooms already free, as [building, room] pairs).
+
+    Returns:
+        bool: False if the chat already has MAX_WATCHES subscriptions.
+    """
+    with _lock:
+        watches = context.bot_data.setdefault('watches', {}).setdefault(chat_id, [])
+        if len(watches) >= MAX_WATCHES:
+            return False
+        watches.append(watch)
+        return True
+
+
+def remove_watches(context: CallbackContext, chat_id):
+    """Removes every subscription of a chat.
+
+    Args:
+        context (CallbackContext): The callback context.
+        chat_id (int): The chat.
+
+    Returns:
+        int: The number of removed subscriptions.
+    """
+    with _lock:
+        return len(context.bot_data.get('watches', {}).pop(chat_id, []))
+
+
+def is_expired(watch, now):
+    """Checks whether the window of a subscription is over.
+
+    Args:
+        watch (dict): The subscription.
+        now (datetime): The current time in Europe/Rome.
+
+    Returns:
+        bool: True if the window has ended.
+    """
+    day , month , year = watch['date'].split('/')
+    end = pytz.timezone('Europe/Rome').localize(datetime(int(year) , int(month) , int(day) , min(int(watch['end_time']) , 23)))
+    return end <= now
+
+
+def update_free(watch, keys):
+    """Replaces the rooms known to be free for a subscription.
+
+    Args:
+        watch (dict): The subscription.
+        keys (list): The rooms free now, as [building, room] pairs.
+
+    Returns:
+        set: The rooms that were known to be free before, as (building, room) tuples.
+    """
+    with _lock:
+        known = {tuple(key) for key in watch['free']}
+        watch['free'] = keys
+    return known
+
+
+def watch_window(watch, now):
+    """Returns the part of the window of a subscription that is still ahead.
+
+    On the day of the subscription the window starts at the current quarter hour,
+    converted to table time as end_state does for the hours of a search, so that
+    a room is reported as free from the run following the end of its lesson.
+
+    Args:
+        watch (dict): The subscription.
+        now (datetime): The current time in Europe/Rome.
+
+    Returns:
+        tuple: (start, end) as floats in the times of the table, or None if the window is over.
+    """
+    start = float(watch['start_time'] + TIME_SHIFT)
+    end = float(watch['end_time'] + TIME_SHIFT)
+    if watch['date'] == now.strftime("%d/%m/%Y"):
+        start = max(start , now.hour + now.minute // 15 * TIME_SHIFT + TIME_SHIFT)
+    return (start , end) if start < end else None
+
+
+def grouped_watches(bot_data):
+    """Drops the expired subscriptions and groups the others by page.
+
+    Args:
+        bot_data (dict): The bot data.
+
+    Returns:
+        dict: (location, date) mapped to lists of (chat_id, watch).
+    """
+    now = datetime.now(pytz.timezone('Europe/Rome'))
+    groups = {}
+    with _lock:
+        watches = bot_data.get('watches', {})
+        for chat_id in list(watches):
+            watches[chat_id] = [watch for watch in watches[chat_id] if not is_expired(watch , now)]
+            if not watches[chat_id]:
+                del watches[chat_id]
+                continue
+            for watch in watches[chat_id]:
+                groups.setdefault((watch['location'] , watch['date']) , []).append((chat_id , watch))
+    return groups
@@ -0,0 +1,231 @@
+"""
+This module provides an asyncio variant of the occupancy lookups.
+
+Requests go through a shared aiohttp keep-alive connection pool, with connect and
+read timeouts, bounded concurrency and retries with exponential backoff. Parsing
+and caching are shared with the sync API in find_classrooms, in the same order:
+in-memory cache (stale days are served while a refresh runs), snapshots, page
+store, network, and the expired page when the upstream site fails; errors are
+handled as in the sync API. Requires aiohttp.
+"""
+import time
+import asyncio
+import logging
+from .find_classrooms import URL , HEADERS , request_params , stale_day , stored_day , fetched_day , expired_day , sede_day
+from .free_classroom import free_rooms_of_day
+from . import sede_map
+from .http_client import POOL_SIZE , CONNECT_TIMEOUT , READ_TIMEOUT , RETRIES , BACKOFF , RETRY_STATUSES
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+CONCURRENCY = 4 # requests in flight at the same time
+
+
+class _RetryableStatus(Exception):
+    """Raised for upstream responses worth retrying (RETRY_STATUSES), while attempts are left."""
+
+
+def _log_refresh(task, location, day, month, year):
+    """Logs a failed background refresh, whose result nobody awaits."""
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning(f"Background refresh of {location} {day}/{month}/{year} failed, still serving stale data: {task.exception()}")
+
+
+class AsyncClient:
+    """Fetches and parses occupancy pages on a shared connection pool."""
+
+    def __init__(self, pool_size=POOL_SIZE, concurrency=CONCURRENCY, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, retries=RETRIES, backoff=BACKOFF):
+        """Initializes the client. The pool is opened on first use.
+
+        Args:
+            pool_size (int, optional): Maximum number of pooled connections.
+            concurrency (int, optional): Maximum number of requests in flight.
+            connect_timeout (float, optional): Connection timeout, in seconds.
+            read_timeout (float, optional): Read timeout, in seconds.
+            retries (int, optional): Retries after a failed attempt.
+            backoff (float, optional): Delay before the first retry, in seconds.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the async client")
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.coalesced = 0
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+        self._inflight = {}
+
+    def _bind(self):
+        """Opens the pool for the running event loop, if needed."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=HEADERS)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+            self._inflight = {}
+
+    async def close(self):
+        """Closes the connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def fetch(self, location, day, month, year):
+        """Downloads an occupancy page, retrying on network errors and RETRY_STATUSES responses.
+
+        As with ScrapingClient, the last response is returned whatever its status,
+        and a network error is raised once the retries are exhausted.
+
+        Args:
+            location (str): The campus location code (e.g., 'MIA').
+            day (int): The day of the month.
+            month (int): The month (1-12).
+            year (int): The year (YYYY).
+
+        Returns:
+            tuple: (status, text) of the response.
+        """
+        self._bind()
+        params = {key : str(value) for key , value in request_params(location , day , month , year).items()}
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    start_time = time.time()
+                    async with self._session.get(URL , params=params) as r:
+                        if r.status in RETRY_STATUSES and attempt < self.retries:
+                            raise _RetryableStatus(r.status)
+                        text = await r.text()
+                    logging.info(f"PoliMi Request (async): {time.time() - start_time:.2f}s | Attempt: {attempt + 1}")
+                    return r.status , text
+            except (aiohttp.ClientError , asyncio.TimeoutError , _RetryableStatus) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logging.warning("PoliMi request failed (%s), retrying in %.1fs", e if str(e) else type(e).__name__, delay)
+                await asyncio.sleep(delay)
+
+    async def _fetch_day(self, location, day, month, year):
+        # the stores and the parsing block, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        parsed , page = await loop.run_in_executor(None , stored_day , location , day , month , year)
+        if parsed is not None:
+            return parsed
+
+        try:
+            status , text = await self.fetch(location , day , month , year)
+        except Exception:
+            if page is None:
+                raise
+            return await loop.run_in_executor(None , expired_day , location , day , month , year , page)
+        return await loop.run_in_executor(None , fetched_day , location , day , month , year , status , text , page)
+
+    async def load_day(self, location, day, month, year):
+        """Asynchronous load_day: parsed occupancy data and room index.
+
+        Concurrent identical lookups share the same fetch and parse. As in
+        find_classrooms.load_day, an expired day is returned immediately while a
+        refresh runs on the event loop, and mapped sedi are filtered from their
+        campus day.
+
+        Args:
+            location (str): The campus location code (e.g., 'MIA').
+            day (int): The day of the month.
+            month (int): The month (1-12).
+            year (int): The year (YYYY).
+
+        Returns:
+            ParsedDay: The occupancy data and its room index.
+        """
+        campus = sede_map.campus_of(location)
+        if campus is not None:
+            campus_day = await self.load_day(campus , day , month , year)
+            return await asyncio.get_running_loop().run_in_executor(None , sede_day , location , campus_day , day , month , year)
+
+        parsed , fresh = stale_day(location , day , month , year)
+        if fresh:
+            return parsed
+
+        self._bind()
+        key = (location , int(day) , int(month) , int(year))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_day(location , day , month , year))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key , None))
+            if parsed is not None:
+                task.add_done_callback(lambda done: _log_refresh(done , location , day , month , year))
+        elif parsed is None:
+            self.coalesced += 1
+        if parsed is not None:
+            return parsed
+        return await asyncio.shield(task)
+
+    async def find_classrooms(self, location, day, month, year):
+        """Asynchronous find_classrooms.
+
+        Args:
+            location (str): The campus location code (e.g., 'MIA').
+            day (int): The day of the month.
+            month (int): The month (1-12).
+            year (int): The year (YYYY).
+
+        Returns:
+            dict: Building names mapped to Building objects (see search.model).
+        """
+        return (await self.load_day(location , day , month , year)).info
+
+    async def find_free_room(self, starting_time, ending_time, location, day, month, year):
+        """Asynchronous find_free_room.
+
+        Args:
+            starting_time (float): The start time of the search interval.
+            ending_time (float): The end time of the search interval.
+            location (str): The campus location code.
+            day (int): The day of the month.
+            month (int): The month.
+            year (int): The year.
+
+        Returns:
+            dict: Building names mapped to lists of FreeRoom.
+        """
+        return free_rooms_of_day(await self.load_day(location , day , month , year) , starting_time , ending_time)
+
+
+_client = None
+
+
+def get_client():
+    """Returns the shared AsyncClient, creating it on first use.
+
+    Returns:
+        AsyncClient: The shared client.
+    """
+    global _client
+    if _client is None:
+        _client = AsyncClient()
+    return _client
+
+
+async def find_classrooms_async(location , day , month , year):
+    """Asynchronous find_classrooms on the shared client.
+
+    Returns:
+        dict: Building names mapped to Building objects (see search.model).
+    """
+    return await get_client().find_classrooms(location , day , month , year)
+
+
+async def find_free_room_async(starting_time , ending_time , location , day , month , year):
+    """Asynchronous find_free_room on the shared client.
+
+    Returns:
+        dict: Building names mapped to lists of FreeRoom.
+    """
+    return await get_client().find_free_room(starting_time , ending_time , location , day , month , year)
@@ -0,0 +1,94 @@
+"""
+This module answers free-room searches over several locations and days at once.
+"""
+import logging
+import pytz
+from datetime import datetime , timedelta
+from concurrent.futures import ThreadPoolExecutor , as_completed
+from .free_classroom import find_free_room
+
+BATCH_WORKERS = 4 # maximum number of concurrent fetches
+
+
+def next_days(days):
+    """Lists the next days, starting from today in Europe/Rome.
+
+    Args:
+        days (int): How many days to list.
+
+    Returns:
+        list: The list of dates.
+    """
+    today = datetime.now(pytz.timezone('Europe/Rome')).date()
+    return [today + timedelta(days=x) for x in range(days)]
+
+
+def campus_locations(location_dict, campus):
+    """Lists the sede codes of a campus.
+
+    Args:
+        location_dict (dict): The dictionary loaded from json/location.json.
+        campus (str): The campus name (e.g., 'Milano Città Studi').
+
+    Returns:
+        list: The sede codes, or the campus code if the campus has no sedi.
+    """
+    sedi = location_dict[campus].get("sedi", {})
+    return list(sedi.values()) if sedi else [location_dict[campus]["code"]]
+
+
+def find_free_rooms_batch(starting_time, ending_time, locations, dates, max_workers=BATCH_WORKERS):
+    """Finds available classrooms for several locations and days.
+
+    Fetches run in parallel on a bounded thread pool; each (location, day) page is
+    fetched and parsed once thanks to the find_classrooms caches. Results are
+    streamed one day at a time, as soon as every location of that day is ready.
+
+    Args:
+        starting_time (float): The start time of the search interval.
+        ending_time (float): The end time of the search interval.
+        locations (list): The location codes.
+        dates (list): The days to search.
+        max_workers (int, optional): Maximum number of concurrent fetches.
+
+    Yields:
+        tuple: (date, results) where results maps every location code to the
+               free rooms returned by find_free_room ({} if the search failed).
+    """
+    if not locations:
+        return
+    pending = {date : len(locations) for date in dates}
+    results = {date : {} for date in dates}
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for date in dates:
+            for location in locations:
+                future = pool.submit(find_free_room , starting_time , ending_time , location , date.day , date.month , date.year)
+                futures[future] = (date , location)
+
+        for future in as_completed(futures):
+            date , location = futures[future]
+            try:
+                results[date][location] = future.result()
+            except Exception as e:
+                logging.error("Batch search failed for %s %s: %s", location, date.strftime("%d/%m/%Y"), e)
+                results[date][location] = {}
+            pending[date] -= 1
+            if not pending[date]:
+                yield date , results.pop(date)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import json
+    from os.path import join , dirname , abspath
+
+    with open(join(dirname(dirname(abspath(__file__))), 'json/location.json')) as location_json:
+        location_dict = json.load(location_json)
+
+    # all sedi of Milano Città Studi over the next 7 days, between 14 and 18
+    for date , rooms in find_free_rooms_batch(14.25 , 18.25 , campus_locations(location_dict , "Milano Città Studi") , next_days(7)):
+        print(date.strftime("%d/%m/%Y") , {location : sum(len(r) for r in rooms[location].values()) for location in rooms})
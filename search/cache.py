@@ -0,0 +1,96 @@
+"""
+This module provides the TTLCache class, a small thread-safe in-memory cache with TTL and LRU eviction.
+
+Expired entries can optionally be kept for a while and served as stale.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Maps keys to values that expire after a time-to-live.
+
+    When the cache is full, the least recently used entry is evicted. Expired
+    entries are kept for `stale_ttl` more seconds and returned by get_stale.
+    """
+
+    def __init__(self, maxsize, ttl, stale_ttl=0):
+        """Initializes an empty cache.
+
+        Args:
+            maxsize (int): The maximum number of entries kept.
+            ttl (float): The default time-to-live of an entry, in seconds.
+            stale_ttl (float, optional): How long an expired entry can still be served as stale, in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, value)
+
+    def get(self, key):
+        """Returns the value stored for `key`, if present and not expired.
+
+        Args:
+            key (hashable): The key to look up.
+
+        Returns:
+            The cached value, or None on a miss.
+        """
+        value , fresh = self.get_stale(key)
+        return value if fresh else None
+
+    def get_stale(self, key):
+        """Returns the value stored for `key`, even if expired within the stale window.
+
+        Args:
+            key (hashable): The key to look up.
+
+        Returns:
+            tuple: (value, fresh), or (None, False) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None , False
+            now = time.time()
+            if entry[0] + self.stale_ttl <= now:
+                del self._entries[key]
+                return None , False
+            self._entries.move_to_end(key)
+            return entry[1] , entry[0] > now
+
+    def put(self, key, value, expires_at=None):
+        """Stores `value` for `key`, replacing any previous entry.
+
+        Args:
+            key (hashable): The key to store.
+            value: The value to store.
+            expires_at (float, optional): The epoch at which the entry expires.
+                Defaults to now plus the cache TTL.
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Removes the entry stored for `key`, if any.
+
+        Args:
+            key (hashable): The key to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,24 +1,89 @@
-from logging import root
-import requests
-import requests_cache
-import time as time_module
+import os
+import time
 import logging
-from bs4 import BeautifulSoup
 import json
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from .singleflight import SingleFlight
+from .cache import TTLCache
+from .http_client import ScrapingClient
+from .page_store import PageStore
+from .table_parser import parse_table , table_region , table_digest , BASE_URL , TIME_SHIFT
+from .power_plugs import rooms_with_power
+from .ttl_policy import ttl_for
+from .snapshot import DaySnapshot
+from .model import export
+from .schedule_diff import diff_days
+from . import room_index , numpy_engine , snapshot , sede_map
 
-requests_cache.install_cache('polimi_cache', expire_after=3600)
+CACHE_EXPIRE = 3600 # default seconds an occupancy page stays cached, see ttl_policy for the per-date TTL
+PARSED_CACHE_SIZE = 256 # parsed days kept in memory (7 days for every location fit)
+INFO_CACHE_SIZE = 16 # days kept decoded as objects for find_classrooms, the others only as snapshots
+STALE_WHILE_REVALIDATE = os.environ.get("STALE_WHILE_REVALIDATE", "1") == "1"
+STALE_MAX_AGE = int(os.environ.get("STALE_MAX_AGE", 6 * 3600)) # seconds an expired day can still be served
+PAGE_STORE_PATH = os.environ.get("PAGE_STORE_PATH", "data/polimi_pages.sqlite")
+PAGE_STORE_BUDGET = int(os.environ.get("PAGE_STORE_BUDGET", 32 * 1024 * 1024)) # compressed bytes kept on disk
+PAGE_STORE_VACUUM_INTERVAL = 3600 # seconds between two vacuums of the page store
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "data/snapshots") # parsed days shared between processes, empty to disable
 
 URL = "https://onlineservices.polimi.it/spazi/spazi/controller/OccupazioniGiornoEsatto.do"
-BASE_URL = "https://onlineservices.polimi.it/spazi/spazi/controller/"
-BUILDING = 'innerEdificio'
-ROOM = 'dove'
-LECTURE = 'slot'
-TIME_SHIFT = 0.25
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
 MIN_TIME = 8
 MAX_TIME = 20
 
 GARBAGE = ["PROVA_ASICT" , "2.2.1-D.I."]
 
+"""
+Engines answering free-room queries: each one builds an index of a parsed day
+(build_index) and queries it (free_rooms). Selected with FREE_ROOM_ENGINE.
+"""
+ENGINES = {'index' : room_index , 'numpy' : numpy_engine}
+FREE_ROOM_ENGINE = os.environ.get("FREE_ROOM_ENGINE", "index")
+if FREE_ROOM_ENGINE == 'numpy' and numpy_engine.np is None:
+    logging.warning("numpy is not installed, falling back to the index engine")
+    FREE_ROOM_ENGINE = 'index'
+ENGINE = ENGINES[FREE_ROOM_ENGINE]
+
+_client = ScrapingClient() # pooled session
+page_store = PageStore(PAGE_STORE_PATH , PAGE_STORE_BUDGET , STALE_MAX_AGE if STALE_WHILE_REVALIDATE else 0) # downloaded pages, the HTTP cache tier
+_flight = SingleFlight() # coalesces concurrent lookups of the same page
+_parsed = TTLCache(PARSED_CACHE_SIZE , CACHE_EXPIRE , STALE_MAX_AGE if STALE_WHILE_REVALIDATE else 0) # parsed pages, mirrors the page store
+_revalidator = ThreadPoolExecutor(max_workers=2) # background refreshes of stale days
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+_change_listeners = [] # called with the changes of every refreshed day, see on_schedule_change
+_sede_days = TTLCache(PARSED_CACHE_SIZE , CACHE_EXPIRE , STALE_MAX_AGE if STALE_WHILE_REVALIDATE else 0) # sede days, filtered from their campus day
+
+class ParsedDay(namedtuple('ParsedDay', ['snapshot', 'index', 'fetched_at', 'expires_at'])):
+    """A parsed day: its compact snapshot (see search.snapshot), its room index
+    (built on the snapshot), the epoch at which the page was downloaded and the
+    epoch at which it expires.
+    """
+    __slots__ = ()
+
+    @property
+    def info(self):
+        """The occupancy data returned by find_classrooms, decoded from the snapshot.
+
+        The last INFO_CACHE_SIZE decoded days are kept, so a warm call does not decode again.
+        """
+        return _decoded(self.snapshot)
+
+
+@lru_cache(maxsize=INFO_CACHE_SIZE)
+def _decoded(snap):
+    return snap.to_info()
+
+
+def _indexed_day(data , fetched_at , expires_at):
+    """Wraps a snapshot and its index in a ParsedDay."""
+    snap = DaySnapshot(data)
+    return ParsedDay(snap , ENGINE.build_index(snap) , fetched_at , expires_at)
+
+
+EMPTY_DAY = _indexed_day(snapshot.dump({}), None, None)
 
 
 def clean_data(infos):
@@ -32,100 +97,539 @@ def clean_data(infos):
     """
     for building in infos:
         for room in GARBAGE:
-            if room in infos[building]:
-                del infos[building][room]          
+            if room in infos[building].rooms:
+                del infos[building].rooms[room]
             
     return infos
 
 
-def find_classrooms(location , day , month , year):
+def coalesced_calls():
+    """Returns how many lookups were served by another caller's in-flight fetch.
+
+    Returns:
+        int: The number of coalesced calls since startup.
+    """
+    return _flight.coalesced
+
+
+def cached_day(location , day , month , year):
+    """Returns a parsed day from the in-memory cache, without fetching it.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        ParsedDay: The cached day, or None if it is missing or expired.
+    """
+    return _parsed.get((location , int(day) , int(month) , int(year)))
+
+
+def stale_day(location , day , month , year):
+    """Returns a parsed day from the in-memory cache, even if expired, without fetching it.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        tuple: (parsed, fresh) where 'parsed' is None if the day is missing or expired
+               for longer than STALE_MAX_AGE, and 'fresh' is True if it has not expired.
+    """
+    return _parsed.get_stale((location , int(day) , int(month) , int(year)))
+
+
+def is_stale(parsed):
+    """Checks whether a parsed day was served past its expiration.
+
+    Args:
+        parsed (ParsedDay): The day returned by load_day.
+
+    Returns:
+        bool: True if the data is older than its time-to-live.
+    """
+    return parsed.expires_at is not None and parsed.expires_at <= time.time()
+
+
+def data_version(parsed):
+    """Returns a version of the schedule of a parsed day, for keying derived results.
+
+    A refreshed page whose table did not change keeps the same version.
+
+    Args:
+        parsed (ParsedDay): The day returned by load_day.
+
+    Returns:
+        bytes: The digest of the table the day was parsed from.
+    """
+    return parsed.snapshot.digest
+
+
+def _revalidate(key , location , day , month , year):
+    """Refreshes a stale day in the background, unless a refresh is already running.
+
+    Args:
+        key (tuple): The cache key of the day.
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+    """
+    with _revalidating_lock:
+        if key in _revalidating:
+            return
+        _revalidating.add(key)
+
+    def refresh():
+        try:
+            _flight.do(key , _fetch_day , location , day , month , year)
+        except Exception as e:
+            logging.warning(f"Background refresh of {location} {day}/{month}/{year} failed, still serving stale data: {e}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    _revalidator.submit(refresh)
+
+
+def load_day(location , day , month , year , force_refresh=False):
+    """Retrieves the parsed occupancy data and room index for a date and location.
+
+    Parsed pages are cached in memory for as long as the underlying page store
+    entry is valid, so a warm lookup skips both the request and the parsing.
+    Concurrent identical lookups share a single fetch and parse: every caller
+    receives the same result, or the same exception. The returned data is
+    shared between callers and must not be modified.
+
+    With STALE_WHILE_REVALIDATE, an expired day is returned immediately (see
+    is_stale) while a single background refresh fetches the new one; it is also
+    returned when the upstream site fails.
+
+    A sede mapped in json/sedeBuildings.json (see sede_map) is filtered from the
+    day of its campus, so every sede of a campus shares one fetch.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        force_refresh (bool, optional): Bypass the page store and store a fresh copy. Defaults to False.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index.
+    """
+    campus = sede_map.campus_of(location)
+    if campus is not None:
+        return sede_day(location , load_day(campus , day , month , year , force_refresh) , day , month , year)
+
+    key = (location , int(day) , int(month) , int(year))
+    if force_refresh:
+        return _flight.do(key , _fetch_day , location , day , month , year , force_refresh)
+
+    parsed , fresh = stale_day(location , day , month , year)
+    if fresh:
+        return parsed
+    if parsed is not None:
+        _revalidate(key , location , day , month , year)
+        return parsed
+    return _flight.do(key , _fetch_day , location , day , month , year)
+
+
+def find_classrooms(location , day , month , year , force_refresh=False):
+    """Retrieves classroom information for a specific date and location.
+
+    See load_day for caching and sharing of the result, which must not be modified.
+    A warm call returns the day decoded by a previous call (see ParsedDay.info);
+    free-room queries should use load_day and free_rooms_of_day, which only read
+    the snapshot of the day through its index.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        force_refresh (bool, optional): Bypass the page store and store a fresh copy. Defaults to False.
+
+    Returns:
+        dict: Building names mapped to Building objects (see search.model), holding their rooms and lessons.
+    """
+    return load_day(location , day , month , year , force_refresh).info
+
+
+def sede_day(location , campus_day , day , month , year):
+    """Filters the buildings of a sede out of the day of its campus.
+
+    The result is cached until the campus day is replaced.
+
+    Args:
+        location (str): The sede code (e.g., 'MIA02').
+        campus_day (ParsedDay): The day of the campus the sede belongs to.
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        ParsedDay: The occupancy data and room index of the sede, with the times
+                   and the digest of the campus day.
+    """
+    key = (location , int(day) , int(month) , int(year))
+    derived , _ = _sede_days.get_stale(key)
+    if derived is not None and derived[0] is campus_day:
+        return derived[1]
+
+    # only the buildings of the sede are decoded from the campus snapshot
+    info = campus_day.snapshot.to_info(sede_map.buildings_of(location))
+    parsed = _indexed_day(snapshot.dump(info , campus_day.fetched_at , campus_day.expires_at , campus_day.snapshot.digest) , campus_day.fetched_at , campus_day.expires_at)
+    _sede_days.put(key , (campus_day , parsed) , campus_day.expires_at)
+    return parsed
+
+
+def request_params(location , day , month , year):
+    """Builds the query parameters of the OccupazioniGiornoEsatto page.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        dict: The query parameters.
+    """
+    return {'csic': location , 'categoria' : 'tutte', 'tipologia' : 'tutte', 'giorno_day' : day , 'giorno_month' : month, 'giorno_year' : year , 'jaf_giorno_date_format' : 'dd%2FMM%2Fyyyy'  , 'evn_visualizza' : ''}
+
+
+def page_key(location , day , month , year):
+    """Builds the page store key of a date and location.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        str: The key (e.g., 'MIA/2021-10-25').
+    """
+    return f"{location}/{int(year):04d}-{int(month):02d}-{int(day):02d}"
+
+
+def snapshot_path(location , day , month , year):
+    """Returns the snapshot file of a date and location.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        str: The path (e.g., 'data/snapshots/MIA/2021-10-25.snap').
+    """
+    return os.path.join(SNAPSHOT_DIR , page_key(location , day , month , year) + '.snap')
+
+
+def load_snapshot(location , day , month , year):
+    """Loads a parsed day from the snapshot written by this or another process.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        ParsedDay: The day, or None if there is no fresh snapshot.
+    """
+    if not SNAPSHOT_DIR:
+        return None
+    snap = snapshot.load(snapshot_path(location , day , month , year))
+    if snap is None or snap.expires_at is None or snap.expires_at <= time.time():
+        return None
+    parsed = ParsedDay(snap , ENGINE.build_index(snap) , snap.fetched_at , snap.expires_at)
+    _parsed.put((location , int(day) , int(month) , int(year)) , parsed , parsed.expires_at)
+    return parsed
+
+
+def stored_expiry(location , day , month , year):
+    """Returns when the stored copy of a day expires, without loading it.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        float: The latest expiration epoch of its snapshot and of its page, or None if neither is stored.
+    """
+    expiries = [page_store.expiry(page_key(location , day , month , year))]
+    if SNAPSHOT_DIR:
+        snap = snapshot.load(snapshot_path(location , day , month , year))
+        if snap is not None:
+            expiries.append(snap.expires_at)
+    expiries = [expires for expires in expiries if expires is not None]
+    return max(expiries) if expiries else None
+
+
+def expiration(day , month , year):
+    """Returns the epoch at which a page of a given day fetched now expires.
+
+    Args:
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        float: The expiration epoch (inf for pages that never expire).
+    """
+    ttl = ttl_for(day , month , year)
+    return float('inf') if ttl is None else time.time() + ttl
+
+
+def on_schedule_change(callback):
+    """Registers a function called when a refreshed day differs from its previous version.
+
+    The callback receives the location code, the day, the month, the year and the
+    list of RoomChange returned by schedule_diff.diff_days. It runs on the thread
+    that refreshed the day and must not block.
+
+    Args:
+        callback (callable): The function to call.
+    """
+    _change_listeners.append(callback)
+
+
+def _notify_changes(location , day , month , year , changes):
+    """Passes the changes of a refreshed day to every registered listener."""
+    if not changes:
+        return
+    logging.info(f"Schedule of {location} {day}/{month}/{year} changed: {len(changes)} rooms")
+    for callback in _change_listeners:
+        try:
+            callback(location , day , month , year , changes)
+        except Exception as e:
+            logging.error(f"Schedule change listener failed: {e}")
+
+
+def _previous_day(location , day , month , year):
+    """Returns the last known version of a day, even if expired.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        ParsedDay: The day, with index None when read from a snapshot file, or None if unknown.
+    """
+    parsed , _ = _parsed.get_stale((location , int(day) , int(month) , int(year)))
+    if parsed is not None or not SNAPSHOT_DIR:
+        return parsed
+    snap = snapshot.load(snapshot_path(location , day , month , year))
+    return ParsedDay(snap , None , snap.fetched_at , snap.expires_at) if snap is not None else None
+
+
+def parse_day(location , day , month , year , text , expires_at=None , fetched_at=None):
+    """Parses and indexes a fetched page, then stores it in the parsed cache.
+
+    When the table is the same as in the previous version of the day, the page is
+    not parsed again. Otherwise the lessons added and removed since the previous
+    version are passed to the on_schedule_change listeners.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        text (str): The HTML page.
+        expires_at (float, optional): The epoch at which the page expires. Defaults to the TTL policy.
+        fetched_at (float, optional): The epoch at which the page was downloaded. Defaults to now.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index.
+    """
+    region = table_region(text)
+    if region is None:
+         print(f"Error: Table container not found. Response content length: {len(text)}")
+         return EMPTY_DAY
+
+    rwp = rooms_with_power()
+    digest = table_digest(region , rwp)
+    fetched_at = fetched_at or time.time()
+    expires_at = expires_at or expiration(day , month , year)
+    previous = _previous_day(location , day , month , year)
+    unchanged = previous is not None and previous.snapshot.digest == digest
+    info = None if unchanged else clean_data(parse_table(region , rwp))
+    empty = not previous.snapshot.rooms if unchanged else not any(building.rooms for building in info.values())
+    if empty and expires_at == float('inf'):
+        expires_at = fetched_at + CACHE_EXPIRE # an empty table may be a glitch of the site, check it again later
+
+    if unchanged:
+        # same table as the previous version: keep its data, only the times change
+        data = previous.snapshot.retimed(fetched_at , expires_at)
+    else:
+        data = snapshot.dump(info , fetched_at , expires_at , digest)
+        _observe_sede(location , day , month , year , info)
+        if previous is not None and _change_listeners:
+            _notify_changes(location , day , month , year , diff_days(previous.info , info))
+
+    if SNAPSHOT_DIR:
+        try:
+            snapshot.save(snapshot_path(location , day , month , year) , data)
+        except OSError as e:
+            logging.warning(f"Could not save the snapshot of {location} {day}/{month}/{year}: {e}")
+    parsed = _indexed_day(data , fetched_at , expires_at)
+    # a fresh parse replaces any previous copy, keeping both tiers in sync
+    _parsed.put((location , int(day) , int(month) , int(year)) , parsed , parsed.expires_at)
+    return parsed
+
+
+def _observe_sede(location , day , month , year , info):
+    """Passes a sede page fetched on its own to sede_map.observe, with the cached day of its campus."""
+    campus = sede_map.campus_candidate(location)
+    if campus is None:
+        return
+    campus_day , _ = stale_day(campus , day , month , year)
+    if campus_day is not None:
+        sede_map.observe(location , campus , (int(day) , int(month) , int(year)) , info , campus_day.info)
+
+
+def store_day(location , day , month , year , text):
+    """Parses a downloaded page, then saves it in the page store.
+
+    A page without the occupancy table (e.g., a maintenance page) is not stored.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        text (str): The HTML page.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index.
+    """
+    parsed = parse_day(location , day , month , year , text , expiration(day , month , year))
+    if parsed is not EMPTY_DAY:
+        page_store.put(page_key(location , day , month , year) , text , parsed.expires_at)
+    return parsed
+
+
+def _fetch_day(location , day , month , year , force_refresh=False):
     """Retrieves classroom information for a specific date and location.
 
     Makes a GET request to the Politecnico di Milano online services and parses
-    the HTML response to extract room occupancy data.
-
-    Args:
-        location (str): The campus location code (e.g., 'MIA').
-        day (int): The day of the month.
-        month (int): The month (1-12).
-        year (int): The year (YYYY).
-
-    Returns:
-        dict: A dictionary containing structured information about classrooms and their schedules.
-    """
-    info = {} 
-    buildingName = '-' #defaul value for building
-    info[buildingName] = {} #first initialization due to table format
-
-    params = {'csic': location , 'categoria' : 'tutte', 'tipologia' : 'tutte', 'giorno_day' : day , 'giorno_month' : month, 'giorno_year' : year , 'jaf_giorno_date_format' : 'dd%2FMM%2Fyyyy'  , 'evn_visualizza' : ''}
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    
-    start_time = time_module.time()
-    r = requests.get(URL , params= params, headers=headers)
-    elapsed_time = time_module.time() - start_time
-    
-    cache_status = "HIT" if getattr(r, 'from_cache', False) else "MISS"
-    logging.info(f"PoliMi Request: {elapsed_time:.2f}s | Cache: {cache_status}")
-    
-    if r.status_code != 200:
-        print(f"Error: Failed to fetch data. Status code: {r.status_code}")
-        return {}
-    
-    soup = BeautifulSoup(r.text, 'html.parser')
-    soup = BeautifulSoup(r.text, 'html.parser')
-    tableContainer = soup.find("div", {"id": "tableContainer"})
-    if not tableContainer:
-         print(f"Error: Table container not found. Response content length: {len(r.text)}")
-         return {}
-    tableRows = tableContainer.find_all('tr')[3:] #remove first three headers
-
-    with open("json/roomsWithPower.json","r") as j:
-        rwp = set(json.load(j))
-
-    for row in tableRows:
-        tds = row.find_all('td')
-        if 'class' not in row.attrs:
-            if BUILDING in tds[0].attrs['class']:
-                buildingName = tds[0].string
-                try:
-                    # buildingName = re.search('(Edificio.*)' , buildingName).group(1) #take only the building name
-                    buildingName = buildingName.split('-')[2]
-                except:
-                    print(buildingName)
-                if buildingName not in info:
-                    info[buildingName] = {}
-        else:
-            room = ''
-            time = 7.75
-            for td in tds:
-                if ROOM in td.attrs['class']:
-                    room = td.find('a').string.replace(" ","")
-                    link = td.find('a')['href']
-                    id_aula = int(link.split("=")[-1])
-                    
-                    if room not in info[buildingName]:
-                        info[buildingName][room] = {}
-                        info[buildingName][room]['link'] = BASE_URL + link
-                        info[buildingName][room]['lessons'] = []
-                        info[buildingName][room]['powerPlugs'] = id_aula in rwp
-
-                elif LECTURE in td.attrs['class'] and room != '':
-                    duration = int(td.attrs['colspan'])
-                    lesson_name = td.find('a').string
-                    lesson = {}
-                    lesson['name'] = lesson_name
-                    lesson['from'] = time
-                    time += duration/4
-                    lesson['to'] = time
-                    info[buildingName][room]['lessons'].append(lesson)
-                else:
-                    time += TIME_SHIFT
-    return clean_data(info)
+    the HTML response to extract room occupancy data, then indexes it.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        force_refresh (bool, optional): Bypass the page store and store a fresh copy. Defaults to False.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index.
+    """
+    parsed , page = stored_day(location , day , month , year , force_refresh)
+    if parsed is not None:
+        return parsed
+
+    try:
+        r , elapsed_time = _client.get(URL , label="MISS" , params=request_params(location , day , month , year) , headers=HEADERS)
+    except Exception:
+        if page is None:
+            raise
+        return expired_day(location , day , month , year , page)
+
+    logging.info(f"PoliMi Request: {elapsed_time:.2f}s | Cache: MISS | Coalesced: {_flight.coalesced} | MISS latency: {_client.histogram('MISS').summary()}")
+    return fetched_day(location , day , month , year , r.status_code , r.text , page)
+
+
+def stored_day(location , day , month , year , force_refresh=False):
+    """Looks a day up in the snapshots, then in the page store, without fetching it.
 
+    This is the lookup order of every client, followed by the download when no
+    fresh copy is stored (see fetched_day and expired_day).
 
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        force_refresh (bool, optional): Skip both tiers. Defaults to False.
+
+    Returns:
+        tuple: (parsed, page) where 'parsed' is the day if a fresh copy is stored, else
+               None, and 'page' is the expired StoredPage to fall back on, if any.
+    """
+    if force_refresh:
+        return None , None
+
+    parsed = load_snapshot(location , day , month , year)
+    if parsed is not None:
+        return parsed , None
+
+    start_time = time.time()
+    page = page_store.get(page_key(location , day , month , year))
+    if page is not None and page.fresh:
+        elapsed_time = time.time() - start_time
+        _client.histogram("HIT").observe(elapsed_time)
+        logging.info(f"PoliMi Request: {elapsed_time:.2f}s | Cache: HIT | Coalesced: {_flight.coalesced} | HIT latency: {_client.histogram('HIT').summary()}")
+        parsed = parse_day(location , day , month , year , page.text , page.expires_at , page.created_at)
+        if parsed is not EMPTY_DAY:
+            return parsed , None
+        page = None # stored before pages without a table were refused, fetch it again
+    return None , page
+
+
+def fetched_day(location , day , month , year , status , text , page=None):
+    """Stores and parses a downloaded page, or falls back on the expired one on an error status.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        status (int): The HTTP status of the response.
+        text (str): The HTML page.
+        page (StoredPage, optional): The expired page returned by stored_day.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index, EMPTY_DAY on an error status without a stored page.
+    """
+    if status != 200:
+        print(f"Error: Failed to fetch data. Status code: {status}")
+        if page is not None:
+            return expired_day(location , day , month , year , page)
+        return EMPTY_DAY
+    return store_day(location , day , month , year , text)
+
+
+def expired_day(location , day , month , year , page):
+    """Parses the expired copy of a day, served when the upstream site fails.
+
+    Args:
+        location (str): The campus location code (e.g., 'MIA').
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+        page (StoredPage): The expired page returned by stored_day.
+
+    Returns:
+        ParsedDay: The occupancy data and its room index, stale (see is_stale).
+    """
+    logging.warning(f"PoliMi Request failed, serving the expired page of {location} {day}/{month}/{year}")
+    return parse_day(location , day , month , year , page.text , page.expires_at , page.created_at)
 
 
 if __name__ == "__main__":
     infos =  find_classrooms('MIA' , 25 , 10 , 2021)
     with open('json/infos_a.json' , 'w') as outfile:
-        json.dump(infos , outfile, indent=3)
\ No newline at end of file
+        json.dump(export(infos) , outfile, indent=3)
\ No newline at end of file
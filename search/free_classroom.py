@@ -1,5 +1,6 @@
 from email.policy import default
-from .find_classrooms import find_classrooms
+from .find_classrooms import find_classrooms , load_day , ENGINE
+from .model import FreeRoom , export
 from collections import defaultdict
 from pprint import pprint
 from logging import root
@@ -13,7 +14,7 @@ def _is_room_free(lessons, starting_time, ending_time):
     """Checks if a room is free for the specified time interval.
 
     Args:
-        lessons (list): A list of dictionaries representing lessons/occupancy slots.
+        lessons (list): The Lesson tuples of the room.
         starting_time (float): The start time of the desired interval.
         ending_time (float): The end time of the desired interval.
 
@@ -27,8 +28,8 @@ def _is_room_free(lessons, starting_time, ending_time):
         return (True, until)
 
     for lesson in lessons:
-        start = float(lesson['from'])
-        end = float(lesson['to'])
+        start = lesson.start
+        end = lesson.end
 
         if starting_time <= start and start < ending_time:
             return (False, None)
@@ -42,6 +43,29 @@ def _is_room_free(lessons, starting_time, ending_time):
     return (True, until)
 
 
+def free_rooms_of_day(parsed , starting_time , ending_time):
+    """Finds available classrooms of a parsed day for a given time slot.
+
+    Uses the index built by the selected engine when the day is parsed, which
+    gives the same answers as checking every room with _is_room_free.
+
+    Args:
+        parsed (ParsedDay): The day returned by load_day.
+        starting_time (float): The start time of the search interval.
+        ending_time (float): The end time of the search interval.
+
+    Returns:
+        dict: Building names mapped to lists of FreeRoom.
+    """
+    free_rooms = defaultdict(list)
+
+    for building , r , until in ENGINE.free_rooms(parsed.index , starting_time , ending_time):
+        name , link , powerPlugs = parsed.snapshot.room_display(r)
+        free_rooms[building].append(FreeRoom(name , link , powerPlugs , until))
+    
+    return free_rooms
+
+
 def find_free_room(starting_time , ending_time , location , day , month , year):
     """Finds available classrooms for a given time slot and location.
 
@@ -54,30 +78,13 @@ def find_free_room(starting_time , ending_time , location , day , month , year):
         year (int): The year.
 
     Returns:
-        dict: A dictionary of free rooms grouped by building.
+        dict: Building names mapped to lists of FreeRoom.
     """
-    free_rooms = defaultdict(list)
-    infos = find_classrooms(location , day , month , year)
-
-    for building in infos:
-        for room in infos[building]:
-            lessons = infos[building][room]['lessons']
-            free, until = _is_room_free(lessons , starting_time , ending_time)
-            if free:
-                room_info = {
-                    'name' : room , 
-                    'link':infos[building][room]['link'], 
-                    'until': until,
-                    'powerPlugs': infos[building][room]['powerPlugs']
-                }
-                
-                free_rooms[building].append(room_info)
-    
-    return free_rooms
+    return free_rooms_of_day(load_day(location , day , month , year) , starting_time , ending_time)
 
 
 if __name__ == "__main__":
     now = datetime.datetime.now()
     info = find_free_room(9.25 , 12.25 , 'MIA', 25 , 10 , 2021)
     with open('infos_a.json' , 'w') as outfile:
-        json.dump(info , outfile)
\ No newline at end of file
+        json.dump(export(info) , outfile)
\ No newline at end of file
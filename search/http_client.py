@@ -0,0 +1,154 @@
+"""
+This module provides the HTTP client shared by every PoliMi scraper.
+
+It keeps a pooled requests.Session with per-host connection limits, explicit
+connect and read timeouts and automatic retries, and records per-request latency
+histograms. Settings can be overridden with the HTTP_CONNECT_TIMEOUT,
+HTTP_READ_TIMEOUT, HTTP_RETRIES and HTTP_POOL_SIZE environment variables.
+"""
+import os
+import time
+import bisect
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)) # seconds
+READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 20)) # seconds
+RETRIES = int(os.environ.get("HTTP_RETRIES", 2))
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 8)) # connections per host, further requests wait for a free one
+BACKOFF = 0.5 # seconds, doubled at every retry
+RETRY_STATUSES = (500, 502, 503, 504)
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30) # upper bounds, in seconds
+
+
+class LatencyHistogram:
+    """Counts request latencies in fixed buckets."""
+
+    def __init__(self, buckets=BUCKETS):
+        """Initializes an empty histogram.
+
+        Args:
+            buckets (tuple, optional): The sorted bucket upper bounds, in seconds.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # the last bucket collects everything slower
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Records a latency.
+
+        Args:
+            seconds (float): The request latency.
+        """
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += 1
+
+    def quantile(self, q):
+        """Returns the bucket upper bound below which a fraction of the requests fall.
+
+        Args:
+            q (float): The quantile (e.g., 0.95).
+
+        Returns:
+            float: The bucket upper bound (inf for the overflow bucket), or None if empty.
+        """
+        with self._lock:
+            if not self.total:
+                return None
+            rank = q * self.total
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return self.buckets[i] if i < len(self.buckets) else float('inf')
+
+    def summary(self):
+        """Returns a one-line summary of the histogram.
+
+        Returns:
+            str: The p50, p95 and p99 bucket bounds and the request count.
+        """
+        if not self.total:
+            return "n=0"
+        return f"p50<={self.quantile(0.5)}s p95<={self.quantile(0.95)}s p99<={self.quantile(0.99)}s n={self.total}"
+
+
+class ScrapingClient:
+    """A pooled HTTP session with timeouts, retries and latency histograms."""
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, retries=RETRIES, backoff=BACKOFF):
+        """Initializes the client. The session is created on first use.
+
+        Args:
+            pool_size (int, optional): Maximum number of connections per host, further requests wait for a free one.
+            connect_timeout (float, optional): Connection timeout, in seconds.
+            read_timeout (float, optional): Read timeout, in seconds.
+            retries (int, optional): Retries on connection errors and 5xx responses.
+            backoff (float, optional): Backoff factor between retries, in seconds.
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.histograms = {} # label -> LatencyHistogram
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled session, created on first use.
+
+        Returns:
+            requests.Session: The session.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    retry = Retry(total=self.retries, backoff_factor=self.backoff, status_forcelist=RETRY_STATUSES, allowed_methods=frozenset(['GET']), raise_on_status=False)
+                    # pool_block: threads beyond pool_size wait for a connection instead of opening throwaway ones
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True, max_retries=retry)
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def histogram(self, label):
+        """Returns the latency histogram of a label, creating it if needed.
+
+        Args:
+            label (str): The histogram label (e.g., 'HIT' or 'MISS').
+
+        Returns:
+            LatencyHistogram: The histogram.
+        """
+        with self._lock:
+            if label not in self.histograms:
+                self.histograms[label] = LatencyHistogram()
+            return self.histograms[label]
+
+    def get(self, url, label=None, **kwargs):
+        """Sends a GET request with the default timeouts.
+
+        Args:
+            url (str): The URL.
+            label (callable or str, optional): The histogram label, or a function
+                computing it from the response. Defaults to 'GET'.
+            **kwargs: Passed to requests.Session.get.
+
+        Returns:
+            tuple: (response, elapsed seconds).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        start_time = time.time()
+        r = self.session.get(url, **kwargs)
+        elapsed_time = time.time() - start_time
+        if callable(label):
+            label = label(r)
+        self.histogram(label or 'GET').observe(elapsed_time)
+        return r , elapsed_time
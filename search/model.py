@@ -0,0 +1,126 @@
+"""
+This module provides the domain model of the occupancy data.
+
+A parsed day maps building names to Building objects, each holding its Room
+objects, each holding its Lesson tuples. The classes use __slots__ to keep
+cached days small; export turns any of them back into plain JSON data.
+"""
+from collections import namedtuple
+
+
+class Lesson(namedtuple('Lesson', ['name', 'start', 'end'])):
+    """A lesson or any other booking of a room, from `start` to `end` (e.g., 8.25 to 10.25)."""
+    __slots__ = ()
+
+    def to_dict(self):
+        return {'name' : self.name , 'from' : self.start , 'to' : self.end}
+
+
+class Room:
+    """A room and its lessons of the day."""
+    __slots__ = ('name', 'link', 'id_aula', 'powerPlugs', 'lessons')
+
+    def __init__(self, name, link, id_aula, powerPlugs, lessons=None):
+        """Initializes a room.
+
+        Args:
+            name (str): The room name (e.g., '3.0.1').
+            link (str): The link to the room page.
+            id_aula (int): The room id.
+            powerPlugs (bool): Whether the room is equipped with power plugs.
+            lessons (list, optional): The Lesson tuples, in table order.
+        """
+        self.name = name
+        self.link = link
+        self.id_aula = id_aula
+        self.powerPlugs = powerPlugs
+        self.lessons = [] if lessons is None else lessons
+
+    def __eq__(self, other):
+        return isinstance(other, Room) and all(getattr(self, slot) == getattr(other, slot) for slot in Room.__slots__)
+
+    def __repr__(self):
+        return f"Room({self.name!r}, {len(self.lessons)} lessons)"
+
+    def to_dict(self):
+        return {'link' : self.link , 'lessons' : [lesson.to_dict() for lesson in self.lessons] , 'powerPlugs' : self.powerPlugs}
+
+
+class Building:
+    """A building and its rooms, by name."""
+    __slots__ = ('name', 'rooms')
+
+    def __init__(self, name, rooms=None):
+        """Initializes a building.
+
+        Args:
+            name (str): The building name.
+            rooms (dict, optional): Room names mapped to Room objects.
+        """
+        self.name = name
+        self.rooms = {} if rooms is None else rooms
+
+    def __eq__(self, other):
+        return isinstance(other, Building) and self.name == other.name and self.rooms == other.rooms
+
+    def __repr__(self):
+        return f"Building({self.name!r}, {len(self.rooms)} rooms)"
+
+    def to_dict(self):
+        return {name : room.to_dict() for name , room in self.rooms.items()}
+
+
+class FreeRoom:
+    """A room returned by find_free_room, free until `until`."""
+    __slots__ = ('name', 'link', 'powerPlugs', 'until')
+
+    def __init__(self, name, link, powerPlugs, until):
+        self.name = name
+        self.link = link
+        self.powerPlugs = powerPlugs
+        self.until = until
+
+    def __eq__(self, other):
+        return isinstance(other, FreeRoom) and all(getattr(self, slot) == getattr(other, slot) for slot in FreeRoom.__slots__)
+
+    def __repr__(self):
+        return f"FreeRoom({self.name!r}, until={self.until})"
+
+    def to_dict(self):
+        return {'name' : self.name , 'link' : self.link , 'until' : self.until , 'powerPlugs' : self.powerPlugs}
+
+
+def export(data):
+    """Converts model objects, possibly nested in dicts and lists, to JSON-compatible data.
+
+    Args:
+        data: A model object, or a dict or list of them (e.g., the result of find_classrooms).
+
+    Returns:
+        The same data made of dicts, lists and scalars, in the historical find_classrooms format.
+    """
+    if hasattr(data, 'to_dict'):
+        return data.to_dict()
+    if isinstance(data, dict):
+        return {key : export(value) for key , value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [export(value) for value in data]
+    return data
+
+
+def from_dict(infos):
+    """Builds a parsed day from its exported form (e.g., a json dump of find_classrooms).
+
+    Args:
+        infos (dict): Building names mapped to room names mapped to room dicts.
+
+    Returns:
+        dict: Building names mapped to Building objects.
+    """
+    day = {}
+    for building , rooms in infos.items():
+        day[building] = Building(building)
+        for name , room in rooms.items():
+            lessons = [Lesson(lesson['name'] , lesson['from'] , lesson['to']) for lesson in room['lessons']]
+            day[building].rooms[name] = Room(name , room['link'] , int(room['link'].split("=")[-1]) , room['powerPlugs'] , lessons)
+    return day
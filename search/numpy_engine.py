@@ -0,0 +1,179 @@
+"""
+This module provides an optional NumPy engine for free-room queries.
+
+A parsed day becomes a rooms x quarter-hour boolean matrix on the TIME_SHIFT grid,
+so a window is answered for every room with one slice-and-reduce and "free until"
+with a vectorized argmax. Requires numpy, which is not a mandatory dependency:
+select it with FREE_ROOM_ENGINE=numpy.
+"""
+import sys
+import time
+import json
+import math
+from .table_parser import FIRST_SLOT , TIME_SHIFT
+from .room_index import MAX_TIME , room_starts , to_slot , until as room_until
+from . import room_index
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class AvailabilityMatrix:
+    """The occupancy of every room of a day on the quarter-hour grid."""
+
+    def __init__(self, snap):
+        """Builds the matrices of a parsed day.
+
+        Args:
+            snap (DaySnapshot): The snapshot of the day.
+        """
+        self.snapshot = snap
+        self.rooms = [] # (building, room record number) for every matrix row
+        spans = []
+        unsorted = []
+        for name, first_room, rooms in snap.building_ranges():
+            for r in range(first_room, first_room + rooms):
+                slots = snap.lesson_slots(r)
+                if room_starts(slots)[1] is not None:
+                    unsorted.append(len(self.rooms))
+                self.rooms.append((name, r))
+                spans.append([(start, start + length) for start, length in slots])
+
+        last = max([end for lessons in spans for _, end in lessons] + [math.ceil(to_slot(MAX_TIME)) + 1])
+        self.slots = last + 1
+        self.busy = np.zeros((len(self.rooms), self.slots), dtype=bool)
+        self.starts = np.zeros((len(self.rooms), self.slots), dtype=bool)
+        for i, lessons in enumerate(spans):
+            for start, end in lessons:
+                self.busy[i, start:end] = True
+                self.starts[i, start] = True
+
+        # lessons starting exactly at MAX_TIME only set "free until" when nothing follows them
+        self.until_starts = self.starts.copy()
+        self.max_slot = None
+        if to_slot(MAX_TIME) == int(to_slot(MAX_TIME)):
+            self.max_slot = int(to_slot(MAX_TIME))
+            self.until_starts[:, self.max_slot] = False
+        self.at_max = frozenset(np.flatnonzero(self.starts[:, self.max_slot]).tolist()) if self.max_slot is not None else frozenset()
+        # rooms listed on several rows have unsorted lessons and keep the scalar rule
+        self.unsorted = frozenset(unsorted)
+
+    def _clamp(self, slot):
+        return min(max(slot, 0), self.slots)
+
+    def query(self, starting_time, ending_time):
+        """Answers a window for every room at once.
+
+        Args:
+            starting_time (float): The start time of the desired interval.
+            ending_time (float): The end time of the desired interval.
+
+        Returns:
+            tuple: (free, until, found) arrays, one entry per room. 'found' is False
+                   where 'until' is not given by a lesson starting before MAX_TIME.
+        """
+        low = math.floor(to_slot(starting_time))
+        first = math.ceil(to_slot(starting_time))
+        end = math.ceil(to_slot(ending_time))
+        high = max(end, low + 1)
+
+        free = ~self.busy[:, self._clamp(low):self._clamp(high)].any(axis=1)
+        free &= ~self.starts[:, self._clamp(first):self._clamp(end)].any(axis=1)
+
+        after = self.until_starts[:, self._clamp(end):]
+        if not after.shape[1]:
+            return free , np.full(len(self.rooms), float(MAX_TIME)) , np.zeros(len(self.rooms), dtype=bool)
+        found = after.any(axis=1)
+        until = FIRST_SLOT + (self._clamp(end) + after.argmax(axis=1)) * TIME_SHIFT
+        return free , until , found
+
+
+def build_index(snap):
+    """Builds the availability matrix of a parsed day.
+
+    Args:
+        snap (DaySnapshot): The snapshot of the day.
+
+    Returns:
+        AvailabilityMatrix: The matrix of the day.
+    """
+    return AvailabilityMatrix(snap)
+
+
+def free_rooms(index, starting_time, ending_time):
+    """Finds the rooms that are free for the whole interval.
+
+    Gives the same answers as checking every room with _is_room_free.
+
+    Args:
+        index (AvailabilityMatrix): The matrix returned by build_index.
+        starting_time (float): The start time of the desired interval.
+        ending_time (float): The end time of the desired interval.
+
+    Yields:
+        tuple: (building, room record number, until) for every free room,
+               see DaySnapshot.room_display for its name and link.
+    """
+    if not index.rooms:
+        return
+    free , until , found = index.query(starting_time, ending_time)
+    end = math.ceil(to_slot(ending_time))
+    until = until.tolist()
+    found = found.tolist()
+    for i in np.flatnonzero(free).tolist():
+        building , r = index.rooms[i]
+        if i in index.unsorted or (not found[i] and i in index.at_max):
+            yield building , r , room_until(*room_starts(index.snapshot.lesson_slots(r)), end)
+        else:
+            yield building , r , until[i] if found[i] else MAX_TIME
+
+
+if __name__ == "__main__":
+    """
+    Benchmark of the engines on a full day:
+        python -m search.numpy_engine [infos.json]
+    Without arguments, today's MIA page is fetched.
+    """
+    from datetime import date
+    from .find_classrooms import find_classrooms
+    from .free_classroom import _is_room_free
+    from .model import from_dict
+    from .snapshot import DaySnapshot , dump
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            infos = from_dict(json.load(f))
+    else:
+        today = date.today()
+        infos = find_classrooms('MIA' , today.day , today.month , today.year)
+
+    snap = DaySnapshot(dump(infos))
+    windows = [(start + TIME_SHIFT , end + TIME_SHIFT) for start in range(8, 20) for end in range(start + 1, 21)]
+
+    def scan(starting_time, ending_time):
+        result = []
+        for building in infos:
+            for room in infos[building].rooms.values():
+                free , until = _is_room_free(room.lessons , starting_time , ending_time)
+                if free:
+                    result.append((building , room.name , until))
+        return result
+
+    engines = {'scan' : (lambda: None , lambda index , a , b: scan(a , b)),
+               'index' : (lambda: room_index.build_index(snap) , lambda index , a , b: [(bu , snap.room_display(r)[0] , u) for bu , r , u in room_index.free_rooms(index , a , b)]),
+               'numpy' : (lambda: build_index(snap) , lambda index , a , b: [(bu , snap.room_display(r)[0] , u) for bu , r , u in free_rooms(index , a , b)])}
+
+    rooms = sum(len(infos[building].rooms) for building in infos)
+    print(f"{rooms} rooms, {len(windows)} windows")
+    expected = None
+    for name , (build , query) in engines.items():
+        start = time.perf_counter()
+        index = build()
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        results = [query(index , a , b) for a , b in windows]
+        elapsed = time.perf_counter() - start
+        expected = expected or results
+        print(f"{name:>6}: build {built * 1000:.2f}ms | {elapsed / len(windows) * 1e6:.1f}us per query | {'OK' if results == expected else 'MISMATCH'}")
@@ -0,0 +1,160 @@
+"""
+This module provides the PageStore class, the HTTP cache tier of the occupancy client.
+
+Pages are stored zlib-compressed in a SQLite file under a configurable byte
+budget, evicting the least recently used ones first. Unlike a global
+requests_cache install, it only caches what the occupancy clients put in it:
+the sync and the async client read and fill the same store (see
+find_classrooms.stored_day).
+"""
+import os
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import namedtuple
+from os.path import dirname
+
+"""
+A stored page: its text, when it was downloaded, when it expires and whether it is still fresh.
+"""
+StoredPage = namedtuple('StoredPage', ['text', 'created_at', 'expires_at', 'fresh'])
+
+COMPRESSION_LEVEL = 6
+
+
+class PageStore:
+    """A size-capped, compressed, keyed store of downloaded pages."""
+
+    def __init__(self, path, budget, stale_ttl=0):
+        """Opens (or creates) the store.
+
+        Args:
+            path (str): The SQLite file.
+            budget (int): The maximum number of compressed bytes kept.
+            stale_ttl (float, optional): Seconds an expired page is kept before vacuum removes it.
+        """
+        if dirname(path):
+            os.makedirs(dirname(path), exist_ok=True)
+        self.path = path
+        self.budget = budget
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS pages (key TEXT PRIMARY KEY, body BLOB, size INTEGER, created_at REAL, expires_at REAL, accessed_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+
+    def get(self, key):
+        """Returns the page stored for `key`, even if expired.
+
+        Only fresh pages count as hits.
+
+        Args:
+            key (str): The page key.
+
+        Returns:
+            StoredPage: The page, or None if it is not stored.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT body, created_at, expires_at FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            self._db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+            fresh = row[2] > now
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return StoredPage(zlib.decompress(row[0]).decode('utf-8'), row[1], row[2], fresh)
+
+    def expiry(self, key):
+        """Returns when the page stored for `key` expires, without reading it.
+
+        Neither a hit nor a miss, and the page is not marked as used.
+
+        Args:
+            key (str): The page key.
+
+        Returns:
+            float: The expiration epoch, or None if the page is not stored.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT expires_at FROM pages WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, key, text, expires_at):
+        """Stores a page, then evicts the least recently used pages above the budget.
+
+        Args:
+            key (str): The page key.
+            text (str): The page.
+            expires_at (float): The epoch at which the page expires (inf if never).
+        """
+        body = zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", (key, body, len(body), now, expires_at, now))
+            self._evict()
+
+    def _evict(self):
+        """Removes the least recently used pages until the store fits the budget."""
+        stored = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if stored <= self.budget:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM pages ORDER BY accessed_at").fetchall():
+            if stored <= self.budget:
+                break
+            self._db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            stored -= size
+            self.evictions += 1
+
+    def vacuum(self, context=None):
+        """Drops pages expired for longer than the stale window and compacts the file.
+
+        Can be scheduled directly on the job queue.
+
+        Args:
+            context (CallbackContext, optional): The job context (unused).
+
+        Returns:
+            int: The number of bytes reclaimed on disk.
+        """
+        with self._lock:
+            before = self._file_size()
+            removed = self._db.execute("DELETE FROM pages WHERE expires_at + ? <= ?", (self.stale_ttl, time.time())).rowcount
+            self._db.execute("VACUUM")
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            reclaimed = before - self._file_size()
+        logging.info("Page store vacuum: %d expired pages removed, %d bytes reclaimed | %s", removed, reclaimed, self.summary())
+        return reclaimed
+
+    def _file_size(self):
+        return sum(os.path.getsize(self.path + suffix) for suffix in ('', '-wal') if os.path.exists(self.path + suffix))
+
+    def stats(self):
+        """Returns the store statistics.
+
+        Returns:
+            dict: hits, misses, hit_ratio, entries, bytes_stored and evictions.
+        """
+        with self._lock:
+            entries, stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        lookups = self.hits + self.misses
+        return {'hits' : self.hits, 'misses' : self.misses, 'hit_ratio' : self.hits / lookups if lookups else 0.0,
+                'entries' : entries, 'bytes_stored' : stored, 'evictions' : self.evictions}
+
+    def summary(self):
+        """Returns a one-line summary of the store statistics.
+
+        Returns:
+            str: The summary.
+        """
+        stats = self.stats()
+        return f"hit ratio {stats['hit_ratio']:.1%} | {stats['entries']} pages | {stats['bytes_stored']} bytes | {stats['evictions']} evictions"
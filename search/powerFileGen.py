@@ -1,7 +1,10 @@
+import os
 import re
 import json
-import requests
+import logging
+from os.path import join , dirname , abspath
 from bs4 import BeautifulSoup
+from search.http_client import ScrapingClient
 
 URL = "https://www7.ceda.polimi.it/spazi/spazi/controller/RicercaAula.do?spazi___model___formbean___RicercaAvanzataAuleVO___postBack=true&spazi___model___formbean___RicercaAvanzataAuleVO___formMode=FILTER&spazi___model___formbean___RicercaAvanzataAuleVO___sede=tutte&spazi___model___formbean___RicercaAvanzataAuleVO___sigla=&spazi___model___formbean___RicercaAvanzataAuleVO___categoriaScelta=tutte&spazi___model___formbean___RicercaAvanzataAuleVO___tipologiaScelta=tutte&spazi___model___formbean___RicercaAvanzataAuleVO___iddipScelto=tutti&spazi___model___formbean___RicercaAvanzataAuleVO___soloPreseElettriche=S&spazi___model___formbean___RicercaAvanzataAuleVO___soloPreseElettriche_default=N&spazi___model___formbean___RicercaAvanzataAuleVO___soloPreseDiRete_default=N&evn_ricerca_avanzata=Ricerca aula"
 
@@ -11,10 +14,15 @@ Script to generate the list of classrooms equipped with power outlets.
 Since checking for power outlets for each room during runtime is inefficient,
 this script pre-fetches the data and generates a JSON file. This file can be
 loaded by the bot for constant-time lookups. Note: This script should be run
-periodically to keep the data up-to-date.
+periodically to keep the data up-to-date, from the repository root:
+    python -m search.powerFileGen
 """
 
-r = requests.get(URL)
+logging.basicConfig(level=logging.INFO)
+client = ScrapingClient()
+r , elapsed_time = client.get(URL)
+logging.info(f"PoliMi Request: {elapsed_time:.2f}s | latency: {client.histogram('GET').summary()}")
+r.raise_for_status()
 soup = BeautifulSoup(r.text, 'html.parser')
 tableContainer = soup.find("tbody", {"class": "TableDati-tbody"})
 tableRows = tableContainer.find_all('tr')
@@ -26,4 +34,8 @@ for row in tableRows:
     id_aula = int(re.findall("idaula=(\d+)&",link.find("a")['href'])[0])
     roomsWithPower.append(id_aula)
 
-json.dump(roomsWithPower,open("../json/roomsWithPower.json","w"),indent=3)
+# write to a temporary file and swap it in, so the bot never reloads a partial file
+POWER_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'roomsWithPower.json')
+with open(POWER_FILE + ".tmp","w") as f:
+    json.dump(roomsWithPower,f,indent=3)
+os.replace(POWER_FILE + ".tmp", POWER_FILE)
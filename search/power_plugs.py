@@ -0,0 +1,52 @@
+"""
+This module keeps the set of classrooms equipped with power plugs in memory.
+
+The set is loaded once from json/roomsWithPower.json and reloaded only when the
+file changes on disk, e.g. after search/powerFileGen.py regenerates it.
+"""
+import os
+import json
+import logging
+import threading
+from os.path import join , dirname , abspath
+
+POWER_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'roomsWithPower.json')
+
+_lock = threading.Lock()
+_mtime = None
+_rooms = frozenset()
+
+
+def rooms_with_power():
+    """Returns the ids of the rooms equipped with power plugs.
+
+    Returns:
+        frozenset: The room ids (id_aula), reloaded if the file changed since the last call.
+    """
+    global _mtime , _rooms
+    try:
+        mtime = os.stat(POWER_FILE).st_mtime_ns
+    except OSError as e:
+        logging.warning("Power plug file unavailable: %s", e)
+        return _rooms
+
+    if mtime != _mtime:
+        with _lock:
+            if mtime != _mtime:
+                with open(POWER_FILE, 'r') as j:
+                    _rooms = frozenset(json.load(j))
+                _mtime = mtime
+                logging.info("Loaded %d rooms with power plugs", len(_rooms))
+    return _rooms
+
+
+def has_power_plugs(id_aula):
+    """Checks whether a room is equipped with power plugs.
+
+    Args:
+        id_aula (int): The room id.
+
+    Returns:
+        bool: True if the room has power plugs.
+    """
+    return id_aula in rooms_with_power()
@@ -0,0 +1,164 @@
+"""
+This module provides the Prefetcher class, which keeps the occupancy cache warm for the week ahead.
+"""
+import time
+import logging
+import threading
+import pytz
+from datetime import datetime , timedelta
+from .find_classrooms import load_day , stored_expiry
+from . import sede_map
+
+PREFETCH_DAYS = 7 # same range offered by KeyboadBuilder.day_keyboard
+PREFETCH_INTERVAL = 600 # seconds between two prefetch runs
+PREFETCH_WORKERS = 2 # maximum number of concurrent requests to PoliMi
+PREFETCH_STAGGER = 1.0 # seconds between two consecutive requests
+
+
+def location_codes(location_dict):
+    """Collects every campus and sede code from the location dictionary.
+
+    Args:
+        location_dict (dict): The dictionary loaded from json/location.json.
+
+    Returns:
+        list: The list of location codes, campus codes first.
+    """
+    codes = []
+    for campus in location_dict.values():
+        if campus["code"] not in codes:
+            codes.append(campus["code"])
+    for campus in location_dict.values():
+        for code in campus.get("sedi", {}).values():
+            if code not in codes:
+                codes.append(code)
+    return codes
+
+
+class Prefetcher:
+    """Warms the occupancy cache for every location over the next days.
+
+    Each run only refreshes the pages that are missing or would expire before the
+    next run, starting from the ones that expire soonest. The expirations are read
+    from the snapshots and the page store on the first run, so a restart does not
+    download the pages that are still fresh.
+    """
+
+    def __init__(self, location_dict, days=PREFETCH_DAYS, interval=PREFETCH_INTERVAL, max_workers=PREFETCH_WORKERS, stagger=PREFETCH_STAGGER):
+        """Initializes the Prefetcher.
+
+        Args:
+            location_dict (dict): The dictionary loaded from json/location.json.
+            days (int, optional): How many days to warm, starting from today.
+            interval (int, optional): Seconds between two runs, used as refresh margin.
+            max_workers (int, optional): Maximum number of concurrent requests.
+            stagger (float, optional): Seconds between the start of two requests.
+        """
+        self.codes = location_codes(location_dict)
+        self.days = days
+        self.interval = interval
+        self.max_workers = max_workers
+        self.stagger = stagger
+        self.expires = {} # (code, date) -> epoch at which the cached page expires
+        self.scheduled = set() # (code, date) of the fetches waiting on the job queue
+        self.seeded = False
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def dates(self):
+        """Returns the days to warm, starting from today in Europe/Rome.
+
+        Returns:
+            list: The dates.
+        """
+        today = datetime.now(pytz.timezone('Europe/Rome')).date()
+        return [today + timedelta(days=x) for x in range(self.days)]
+
+    def seed(self):
+        """Reads the expiration of the stored pages, so that fresh pages are not fetched again."""
+        for date in self.dates():
+            for code in self.codes:
+                if sede_map.campus_of(code) is not None or (code, date) in self.expires:
+                    continue
+                expires = stored_expiry(code, date.day, date.month, date.year)
+                if expires is not None:
+                    self.expires[(code, date)] = expires
+        self.seeded = True
+        logging.info("Prefetcher: %d stored pages found", len(self.expires))
+
+    def due(self, now=None):
+        """Lists the pages that must be refreshed during this run.
+
+        Args:
+            now (float, optional): The current epoch. Defaults to time.time().
+
+        Returns:
+            list: (code, date) tuples sorted by expiration, soonest first.
+        """
+        now = time.time() if now is None else now
+        dates = self.dates()
+
+        # forget the days that are no longer offered
+        for key in [k for k in self.expires if k[1] < dates[0]]:
+            del self.expires[key]
+
+        targets = []
+        for date in dates:
+            for code in self.codes:
+                if sede_map.campus_of(code) is not None or (code, date) in self.scheduled:
+                    continue # answered from the campus page, or already on its way
+                expires = self.expires.get((code, date), 0)
+                if expires <= now + self.interval:
+                    targets.append((expires, code, date))
+        targets.sort(key=lambda t: t[0])
+        return [(code, date) for _, code, date in targets]
+
+    def warm(self, code, date):
+        """Refreshes a single page in the cache.
+
+        Args:
+            code (str): The location code.
+            date (date): The day to fetch.
+        """
+        try:
+            # only due pages get here: missing, expired or about to expire
+            parsed = load_day(code, date.day, date.month, date.year, force_refresh=True)
+            if parsed.expires_at is not None:
+                self.expires[(code, date)] = parsed.expires_at
+        except Exception as e:
+            logging.warning("Prefetch of %s %s failed: %s", code, date.strftime("%d/%m/%Y"), e)
+
+    def _warm_job(self, context):
+        """Job callback of a single scheduled fetch.
+
+        The job queue threads are shared with the other jobs, so a fetch never waits
+        for a slot: it is scheduled again `stagger` seconds later instead.
+        """
+        code, date = context.job.context
+        if not self._slots.acquire(blocking=False):
+            context.job_queue.run_once(self._warm_job, self.stagger, context=(code, date))
+            return
+        try:
+            self.warm(code, date)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.scheduled.discard((code, date))
+
+    def run(self, context):
+        """Job callback: schedules a fetch of every due page, one every `stagger` seconds.
+
+        The fetches are separate jobs, so the run itself returns immediately.
+
+        Args:
+            context (CallbackContext): The job context, whose job queue runs the fetches.
+        """
+        if not self.seeded:
+            self.seed()
+        with self._lock:
+            targets = self.due()
+            self.scheduled.update(targets)
+        for i, (code, date) in enumerate(targets):
+            context.job_queue.run_once(self._warm_job, i * self.stagger, context=(code, date))
+        if targets:
+            logging.info("Prefetch: %d pages scheduled over %.0fs", len(targets), len(targets) * self.stagger)
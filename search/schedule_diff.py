@@ -0,0 +1,62 @@
+"""
+This module compares two versions of a parsed day, lesson by lesson.
+"""
+from collections import Counter , namedtuple
+
+"""
+The lessons added to and removed from a room between two versions of a day.
+A room that appeared or disappeared has all its lessons added or removed.
+"""
+RoomChange = namedtuple('RoomChange', ['building', 'room', 'added', 'removed'])
+
+
+def diff_rooms(old , new):
+    """Compares the lessons of two versions of a room.
+
+    Args:
+        old (list): The previous Lesson tuples.
+        new (list): The current Lesson tuples.
+
+    Returns:
+        tuple: (added, removed) lists of Lesson, in table order.
+    """
+    if old == new:
+        return [] , []
+    old_count = Counter(old)
+    new_count = Counter(new)
+    added = [lesson for lesson in new if _take(old_count , lesson)]
+    removed = [lesson for lesson in old if _take(new_count , lesson)]
+    return added , removed
+
+
+def _take(counter , lesson):
+    """Consumes a lesson from a counter, returning True if there was none left."""
+    if counter[lesson]:
+        counter[lesson] -= 1
+        return False
+    return True
+
+
+def diff_days(old , new):
+    """Compares two versions of a parsed day.
+
+    Args:
+        old (dict): The previous data returned by find_classrooms.
+        new (dict): The current data returned by find_classrooms.
+
+    Returns:
+        list: A RoomChange for every room whose lessons changed, in table order.
+    """
+    changes = []
+    for name , building in new.items():
+        previous = old[name].rooms if name in old else {}
+        for room in building.rooms.values():
+            added , removed = diff_rooms(previous[room.name].lessons if room.name in previous else [] , room.lessons)
+            if added or removed:
+                changes.append(RoomChange(name , room.name , added , removed))
+    for name , building in old.items():
+        current = new[name].rooms if name in new else {}
+        for room in building.rooms.values():
+            if room.name not in current and room.lessons:
+                changes.append(RoomChange(name , room.name , [] , list(room.lessons)))
+    return changes
@@ -0,0 +1,72 @@
+import os
+import json
+import logging
+from datetime import date , timedelta
+from os.path import join , dirname , abspath
+from search.http_client import ScrapingClient
+from search.find_classrooms import URL , HEADERS , request_params
+from search.table_parser import parse_table , table_region
+
+"""
+Script to generate the mapping of each sede to its buildings.
+
+A campus page lists the buildings of all its sedi, so the bot answers sede
+searches by filtering the campus page (see search/sede_map.py). This script
+downloads the campus and sede pages of the next weekdays and keeps a sede only
+if its buildings have the same rooms on the campus page. Sedi left out are still
+fetched on their own. It should be run when PoliMi adds or moves buildings,
+from the repository root:
+    python -m search.sedeMapGen
+"""
+
+DAYS = 5 # weekdays sampled, a building without lessons on a day may be missing from its page
+
+logging.basicConfig(level=logging.INFO)
+client = ScrapingClient()
+
+LOCATION_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'location.json')
+with open(LOCATION_FILE , 'r') as j:
+    location_dict = json.load(j)
+
+days = []
+day = date.today()
+while len(days) < DAYS:
+    if day.weekday() < 5:
+        days.append(day)
+    day += timedelta(days=1)
+
+
+def rooms_of(code):
+    """Downloads the pages of a location and collects the rooms of each building."""
+    rooms = {}
+    for day in days:
+        r , elapsed_time = client.get(URL , params=request_params(code , day.day , day.month , day.year) , headers=HEADERS)
+        logging.info(f"PoliMi Request {code} {day}: {elapsed_time:.2f}s")
+        r.raise_for_status()
+        region = table_region(r.text)
+        for name , building in (parse_table(region , frozenset()) if region else {}).items():
+            rooms.setdefault(name , set()).update(building.rooms)
+    return rooms
+
+
+sedeBuildings = {}
+
+for campus in location_dict.values():
+    if not campus.get("sedi"):
+        continue
+    campus_rooms = rooms_of(campus["code"])
+    for name , code in campus["sedi"].items():
+        sede_rooms = rooms_of(code)
+        if not sede_rooms:
+            logging.warning(f"{name} ({code}): no buildings found, not mapped")
+        elif any(rooms != campus_rooms.get(building) for building , rooms in sede_rooms.items()):
+            logging.warning(f"{name} ({code}): its buildings differ on the {campus['code']} page, not mapped")
+        else:
+            sedeBuildings[code] = {"campus" : campus["code"] , "buildings" : sorted(sede_rooms)}
+            logging.info(f"{name} ({code}): {len(sede_rooms)} buildings")
+
+# write to a temporary file and swap it in, so the bot never reloads a partial file
+SEDE_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'sedeBuildings.json')
+with open(SEDE_FILE + ".tmp","w") as f:
+    json.dump(sedeBuildings,f,indent=3)
+os.replace(SEDE_FILE + ".tmp", SEDE_FILE)
@@ -0,0 +1,136 @@
+"""
+This module keeps in memory which buildings belong to each sede of a campus.
+
+A campus page (e.g., MIA) lists the buildings of all its sedi (e.g., MIA02), so
+a sede search can be answered by filtering the campus page instead of fetching
+its own. The mapping is loaded from json/sedeBuildings.json and reloaded only
+when the file changes on disk. Sedi missing from the file are still fetched on
+their own, and learned (see observe) once their buildings matched the campus
+page on LEARN_DAYS different days. The file can also be generated offline by
+search/sedeMapGen.py.
+"""
+import os
+import json
+import logging
+import threading
+from os.path import join , dirname , abspath
+
+SEDE_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'sedeBuildings.json')
+LOCATION_FILE = join(dirname(dirname(abspath(__file__))), 'json', 'location.json')
+LEARN_DAYS = 3 # days a sede must match its campus page before it is mapped, a building without lessons may be missing from a page
+
+_lock = threading.Lock()
+_mtime = None
+_sedi = {} # sede code -> (campus code, frozenset of building names)
+_campuses = None # sede code -> campus code, from json/location.json
+_observed = {} # sede code -> (set of matching days, set of building names)
+_rejected = set() # sedi whose buildings differ on the campus page
+
+
+def sedi():
+    """Returns the mapping of the sedi to their buildings.
+
+    Returns:
+        dict: Sede codes mapped to (campus code, frozenset of building names),
+              reloaded if the file changed since the last call.
+    """
+    global _mtime , _sedi
+    try:
+        mtime = os.stat(SEDE_FILE).st_mtime_ns
+    except OSError:
+        return _sedi # not generated yet, every sede is fetched on its own
+
+    if mtime != _mtime:
+        with _lock:
+            if mtime != _mtime:
+                with open(SEDE_FILE, 'r') as j:
+                    _sedi = {code : (sede["campus"] , frozenset(sede["buildings"])) for code , sede in json.load(j).items()}
+                _mtime = mtime
+                logging.info("Loaded the buildings of %d sedi", len(_sedi))
+    return _sedi
+
+
+def campus_of(code):
+    """Returns the campus whose page contains the buildings of a sede.
+
+    Args:
+        code (str): The location code (e.g., 'MIA02').
+
+    Returns:
+        str: The campus code (e.g., 'MIA'), or None if the location is not a mapped sede.
+    """
+    sede = sedi().get(code)
+    return sede[0] if sede is not None else None
+
+
+def buildings_of(code):
+    """Returns the buildings of a sede.
+
+    Args:
+        code (str): The sede code (e.g., 'MIA02').
+
+    Returns:
+        frozenset: The building names, empty if the sede is not mapped.
+    """
+    sede = sedi().get(code)
+    return sede[1] if sede is not None else frozenset()
+
+
+def campus_candidate(code):
+    """Returns the campus a sede belongs to in json/location.json, if it is not mapped yet.
+
+    Args:
+        code (str): The location code (e.g., 'MIA02').
+
+    Returns:
+        str: The campus code, or None if the location is not a sede, is mapped or was rejected.
+    """
+    global _campuses
+    if _campuses is None:
+        with open(LOCATION_FILE, 'r') as j:
+            _campuses = {sede : campus["code"] for campus in json.load(j).values() for sede in campus.get("sedi", {}).values()}
+    if code in _rejected or code in sedi():
+        return None
+    return _campuses.get(code)
+
+
+def observe(code, campus, date, info, campus_info):
+    """Compares the page of a sede with the page of its campus on the same day.
+
+    The sede is mapped, and json/sedeBuildings.json updated, once its buildings have
+    the same rooms on both pages on LEARN_DAYS different days. It is never mapped
+    if they differ.
+
+    Args:
+        code (str): The sede code (e.g., 'MIA02').
+        campus (str): The campus code (e.g., 'MIA').
+        date (tuple): The day of both pages, as (day, month, year).
+        info (dict): The parsed page of the sede (Building objects).
+        campus_info (dict): The parsed page of the campus.
+    """
+    rooms = {name : set(building.rooms) for name , building in info.items() if building.rooms}
+    if not rooms:
+        return # nothing to compare
+    if any(name not in campus_info or set(campus_info[name].rooms) != names for name , names in rooms.items()):
+        _rejected.add(code)
+        logging.info("Sede %s: its buildings differ on the %s page, not mapped", code, campus)
+        return
+
+    with _lock:
+        days , buildings = _observed.setdefault(code, (set(), set()))
+        days.add(date)
+        buildings.update(rooms)
+        if len(days) < LEARN_DAYS:
+            return
+        del _observed[code]
+        try:
+            with open(SEDE_FILE, 'r') as j:
+                mapping = json.load(j)
+        except OSError:
+            mapping = {}
+        mapping[code] = {"campus" : campus , "buildings" : sorted(buildings)}
+        # write to a temporary file and swap it in, so no process reads a partial file
+        with open(SEDE_FILE + ".tmp", "w") as f:
+            json.dump(mapping, f, indent=3)
+        os.replace(SEDE_FILE + ".tmp", SEDE_FILE)
+    logging.info("Sede %s: %d buildings mapped to the %s page", code, len(buildings), campus)
@@ -0,0 +1,66 @@
+"""
+This module provides the SingleFlight class, which coalesces concurrent identical calls into one.
+"""
+import threading
+
+
+class _Call:
+    """An in-flight call shared by the caller that started it and its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    Callers asking for a key that is already in flight wait for that call and
+    receive its result, or its exception, instead of starting a new one.
+    """
+
+    def __init__(self):
+        """Initializes an empty SingleFlight group."""
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0 # number of calls served by another caller's fetch
+
+    def do(self, key, fn, *args, **kwargs):
+        """Calls `fn(*args, **kwargs)` unless a call for `key` is already running.
+
+        Args:
+            key (hashable): Identifies identical calls.
+            fn (callable): The function to run.
+
+        Returns:
+            The result of the shared call.
+
+        Raises:
+            Exception: The exception raised by the shared call, if any.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,312 @@
+"""
+This module provides a compact binary snapshot of a parsed day.
+
+A snapshot replaces the nested dicts returned by find_classrooms with flat,
+fixed-size records:
+    - a string table, where building, room and lesson names are stored once;
+    - buildings: (name, first room, room count);
+    - rooms: (name, link template, id_aula, flags, first lesson, lesson count),
+      the link being rebuilt as BASE_URL + template + id_aula;
+    - lessons: (start slot, length in quarter hours, name).
+
+Records are read in place with struct, so a snapshot written to disk can be
+mapped with mmap and shared by every bot process on the same machine.
+"""
+import os
+import sys
+import mmap
+import json
+import struct
+from array import array
+from .table_parser import BASE_URL , FIRST_SLOT , TIME_SHIFT
+from .model import Lesson , Room , Building
+
+MAGIC = b'ALSN'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHxxddIIII16s') # magic, version, fetched_at, expires_at, strings, buildings, rooms, lessons, digest
+BUILDING = struct.Struct('<III') # name, first room, rooms
+ROOM = struct.Struct('<IIIIII') # name, link template, id_aula, flags, first lesson, lessons
+LESSON = struct.Struct('<HHI') # start slot, length, name
+
+POWER_PLUGS = 1 # room flags
+ABSOLUTE_LINK = 2 # the link does not start with BASE_URL
+NO_ID_SUFFIX = 4 # the link does not end with id_aula
+NO_STRING = 0xFFFFFFFF # string index of None (e.g., a lesson cell without a name)
+
+
+def _split_link(link , id_aula):
+    """Splits a room link into its template and flags.
+
+    Args:
+        link (str): The room link (e.g., BASE_URL + '...idaula=1234').
+        id_aula (int): The room id.
+
+    Returns:
+        tuple: (template, flags).
+    """
+    flags = 0
+    if link.startswith(BASE_URL):
+        link = link[len(BASE_URL):]
+    else:
+        flags |= ABSOLUTE_LINK
+    if link.endswith(str(id_aula)):
+        return link[:-len(str(id_aula))] , flags
+    return link , flags | NO_ID_SUFFIX
+
+
+def dump(info , fetched_at=None , expires_at=None , digest=b''):
+    """Encodes a parsed day as a snapshot.
+
+    Args:
+        info (dict): The data returned by find_classrooms (Building objects).
+        fetched_at (float, optional): The epoch at which the page was downloaded.
+        expires_at (float, optional): The epoch at which the page expires.
+        digest (bytes, optional): The digest of the table the day was parsed from (see table_parser.table_digest).
+
+    Returns:
+        bytes: The snapshot.
+    """
+    strings = {}
+
+    def intern(string):
+        return NO_STRING if string is None else strings.setdefault(string , len(strings))
+
+    buildings = array('I')
+    rooms = array('I')
+    lessons = bytearray()
+    lesson_count = 0
+    for name , building in info.items():
+        buildings.extend((intern(name) , len(rooms) // 6 , len(building.rooms)))
+        for name , room in building.rooms.items():
+            template , flags = _split_link(room.link , room.id_aula)
+            flags |= POWER_PLUGS if room.powerPlugs else 0
+            rooms.extend((intern(name) , intern(template) , room.id_aula , flags , lesson_count , len(room.lessons)))
+            for lesson in room.lessons:
+                start = round((lesson.start - FIRST_SLOT) / TIME_SHIFT)
+                length = round((lesson.end - lesson.start) / TIME_SHIFT)
+                lessons += LESSON.pack(start , length , intern(lesson.name))
+            lesson_count += len(room.lessons)
+
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array('I' , [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    if sys.byteorder != 'little':
+        buildings.byteswap()
+        rooms.byteswap()
+        offsets.byteswap()
+
+    header = HEADER.pack(MAGIC , VERSION , fetched_at or 0.0 , expires_at or 0.0 , len(encoded) , len(buildings) // 3 , len(rooms) // 6 , lesson_count , digest)
+    return b''.join([header , offsets.tobytes() , buildings.tobytes() , rooms.tobytes() , bytes(lessons) , b''.join(encoded)])
+
+
+class DaySnapshot:
+    """A parsed day read in place from a snapshot buffer (bytes or mmap)."""
+
+    def __init__(self, buffer):
+        """Reads the header of a snapshot.
+
+        Args:
+            buffer (bytes or mmap.mmap): The snapshot.
+
+        Raises:
+            ValueError: If the buffer is not a snapshot of this version.
+        """
+        magic , version , fetched_at , expires_at , strings , buildings , rooms , lessons , digest = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a day snapshot")
+        self.buffer = buffer
+        self.fetched_at = fetched_at or None
+        self.expires_at = expires_at or None
+        self.digest = digest
+        self.buildings = buildings
+        self.rooms = rooms
+        self.lessons = lessons
+        self._offsets = HEADER.size
+        self._buildings = self._offsets + (strings + 1) * 4
+        self._rooms = self._buildings + buildings * BUILDING.size
+        self._lessons = self._rooms + rooms * ROOM.size
+        self._strings = self._lessons + lessons * LESSON.size
+
+    def string(self, i):
+        """Returns a string of the string table.
+
+        Args:
+            i (int): The string index.
+
+        Returns:
+            str: The string.
+        """
+        if i == NO_STRING:
+            return None
+        start , end = struct.unpack_from('<II' , self.buffer , self._offsets + i * 4)
+        return bytes(self.buffer[self._strings + start : self._strings + end]).decode('utf-8')
+
+    def link(self, template , id_aula , flags):
+        """Rebuilds the link of a room.
+
+        Args:
+            template (int): The string index of the link template.
+            id_aula (int): The room id.
+            flags (int): The room flags.
+
+        Returns:
+            str: The link.
+        """
+        link = self.string(template)
+        if not flags & NO_ID_SUFFIX:
+            link += str(id_aula)
+        return link if flags & ABSOLUTE_LINK else BASE_URL + link
+
+    def building_ranges(self):
+        """Lists the buildings and the numbers of their room records.
+
+        Returns:
+            list: (building name, first room, room count) tuples, in table order.
+        """
+        ranges = []
+        for b in range(self.buildings):
+            name , first_room , rooms = BUILDING.unpack_from(self.buffer , self._buildings + b * BUILDING.size)
+            ranges.append((self.string(name) , first_room , rooms))
+        return ranges
+
+    def lesson_slots(self, r):
+        """Returns the lessons of a room on the quarter-hour grid.
+
+        Args:
+            r (int): The room record number.
+
+        Returns:
+            list: (start slot, length) tuples in table order, slot 0 being FIRST_SLOT.
+        """
+        first_lesson , lessons = ROOM.unpack_from(self.buffer , self._rooms + r * ROOM.size)[4:]
+        return [(start , length) for start , length , _ in LESSON.iter_unpack(self.buffer[self._lessons + first_lesson * LESSON.size : self._lessons + (first_lesson + lessons) * LESSON.size])]
+
+    def room_display(self, r):
+        """Decodes what a free-room answer shows of a room.
+
+        Args:
+            r (int): The room record number.
+
+        Returns:
+            tuple: (name, link, powerPlugs).
+        """
+        name , template , id_aula , flags , _ , _ = ROOM.unpack_from(self.buffer , self._rooms + r * ROOM.size)
+        return self.string(name) , self.link(template , id_aula , flags) , bool(flags & POWER_PLUGS)
+
+    def to_info(self, buildings=None):
+        """Decodes the snapshot back to the structure returned by find_classrooms.
+
+        Args:
+            buildings (collection, optional): Decode only the buildings with these names. Defaults to all.
+
+        Returns:
+            dict: Building names mapped to Building objects.
+        """
+        strings = {}
+
+        def string(i):
+            if i not in strings:
+                strings[i] = self.string(i)
+            return strings[i]
+
+        info = {}
+        for b in range(self.buildings):
+            name , first_room , rooms = BUILDING.unpack_from(self.buffer , self._buildings + b * BUILDING.size)
+            if buildings is not None and string(name) not in buildings:
+                continue
+            building = info[string(name)] = Building(string(name))
+            for r in range(first_room , first_room + rooms):
+                name , template , id_aula , flags , first_lesson , lessons = ROOM.unpack_from(self.buffer , self._rooms + r * ROOM.size)
+                room = building.rooms[string(name)] = Room(string(name) , self.link(template , id_aula , flags) , id_aula , bool(flags & POWER_PLUGS))
+                for start , length , lesson_name in LESSON.iter_unpack(self.buffer[self._lessons + first_lesson * LESSON.size : self._lessons + (first_lesson + lessons) * LESSON.size]):
+                    time = FIRST_SLOT + start * TIME_SHIFT
+                    room.lessons.append(Lesson(string(lesson_name) , time , time + length * TIME_SHIFT))
+        return info
+
+    def retimed(self, fetched_at , expires_at):
+        """Returns a copy of the snapshot with new download and expiration epochs.
+
+        Args:
+            fetched_at (float): The epoch at which the page was downloaded.
+            expires_at (float): The epoch at which the page expires.
+
+        Returns:
+            bytes: The snapshot.
+        """
+        data = bytearray(self.buffer)
+        magic , version , _ , _ , *counts = HEADER.unpack_from(data)
+        HEADER.pack_into(data , 0 , magic , version , fetched_at , expires_at , *counts)
+        return bytes(data)
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+def save(path , data):
+    """Writes a snapshot to disk atomically.
+
+    Processes that mapped the previous file keep reading it until they reload.
+
+    Args:
+        path (str): The snapshot file.
+        data (bytes): The snapshot.
+    """
+    os.makedirs(os.path.dirname(path) or '.' , exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp , 'wb') as f:
+        f.write(data)
+    os.replace(tmp , path)
+
+
+def load(path):
+    """Maps a snapshot file in memory.
+
+    Args:
+        path (str): The snapshot file.
+
+    Returns:
+        DaySnapshot: The snapshot, or None if the file is missing or invalid.
+    """
+    try:
+        with open(path , 'rb') as f:
+            return DaySnapshot(mmap.mmap(f.fileno() , 0 , access=mmap.ACCESS_READ))
+    except (OSError , ValueError , struct.error):
+        return None
+
+
+if __name__ == "__main__":
+    """
+    Size of a day as nested dicts and as a snapshot:
+        python -m search.snapshot [infos.json]
+    Without arguments, today's MIA page is fetched.
+    """
+    from datetime import date
+    from .model import from_dict
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            infos = from_dict(json.load(f))
+    else:
+        from .find_classrooms import find_classrooms
+        today = date.today()
+        infos = find_classrooms('MIA' , today.day , today.month , today.year)
+
+    def deep_size(obj , seen=None):
+        seen = set() if seen is None else seen
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if isinstance(obj , dict):
+            size += sum(deep_size(k , seen) + deep_size(v , seen) for k , v in obj.items())
+        elif isinstance(obj , (list , tuple)):
+            size += sum(deep_size(v , seen) for v in obj)
+        elif hasattr(obj , '__slots__'):
+            size += sum(deep_size(getattr(obj , slot) , seen) for slot in obj.__slots__)
+        return size
+
+    data = dump(infos)
+    assert DaySnapshot(data).to_info() == infos
+    print(f"objects: {deep_size(infos)} bytes | snapshot: {len(data)} bytes")
@@ -0,0 +1,288 @@
+"""
+This module parses the occupancy table of the OccupazioniGiornoEsatto page.
+
+Two backends are available and produce the same structure:
+    - 'stream': a streaming html.parser.HTMLParser that only walks div#tableContainer.
+    - 'soup': BeautifulSoup restricted to div#tableContainer with a SoupStrainer.
+
+The backend is selected with the PARSER_BACKEND environment variable ('stream' by default).
+"""
+import os
+import re
+import sys
+import hashlib
+from collections import namedtuple
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup , SoupStrainer
+from .model import Lesson , Room , Building
+
+BASE_URL = "https://onlineservices.polimi.it/spazi/spazi/controller/"
+CONTAINER_ID = 'tableContainer'
+BUILDING = 'innerEdificio'
+ROOM = 'dove'
+LECTURE = 'slot'
+TIME_SHIFT = 0.25
+FIRST_SLOT = 7.75 # time of the first column of the table
+HEADER_ROWS = 3 # header rows at the top of the table
+
+PARSER_BACKEND = os.environ.get("PARSER_BACKEND", "stream")
+
+CONTAINER_REGEX = re.compile(r'id\s*=\s*["\']?' + CONTAINER_ID + r'\b')
+DIV_REGEX = re.compile(r'<(/?)div\b', re.IGNORECASE)
+
+"""
+A table cell, reduced to the fields used to build the occupancy data.
+"""
+Cell = namedtuple('Cell', ['classes', 'colspan', 'text', 'href', 'anchor'])
+
+
+def build_info(rows, rwp):
+    """Builds the building/room/lesson structure from the table rows.
+
+    Args:
+        rows (list): (has_class, cells) tuples, one per table row after the headers.
+        rwp (frozenset): The ids of the rooms equipped with power plugs.
+
+    Returns:
+        dict: Building names mapped to Building objects, holding their rooms and lessons.
+    """
+    info = {}
+    buildingName = '-' #defaul value for building
+    info[buildingName] = Building(buildingName) #first initialization due to table format
+
+    for has_class, cells in rows:
+        if not has_class:
+            if cells and BUILDING in cells[0].classes:
+                buildingName = cells[0].text
+                try:
+                    buildingName = buildingName.split('-')[2] #take only the building name
+                except:
+                    print(buildingName)
+                if buildingName not in info:
+                    info[buildingName] = Building(buildingName)
+        else:
+            room = None
+            time = FIRST_SLOT
+            for cell in cells:
+                if ROOM in cell.classes:
+                    name = cell.anchor.replace(" ","")
+                    link = cell.href
+                    id_aula = int(link.split("=")[-1])
+
+                    rooms = info[buildingName].rooms
+                    if name not in rooms:
+                        rooms[name] = Room(name, BASE_URL + link, id_aula, id_aula in rwp)
+                    room = rooms[name] if name != '' else None
+
+                elif LECTURE in cell.classes and room is not None:
+                    duration = int(cell.colspan)
+                    start = time
+                    time += duration/4
+                    room.lessons.append(Lesson(cell.anchor, start, time))
+                else:
+                    time += TIME_SHIFT
+    return info
+
+
+def table_region(text):
+    """Cuts the table container out of a page, without parsing it.
+
+    Args:
+        text (str): The HTML page.
+
+    Returns:
+        str: The div#tableContainer element, or None if it is missing.
+    """
+    match = CONTAINER_REGEX.search(text)
+    if not match:
+        return None
+    start = max(text.rfind('<', 0, match.start()), 0)
+    depth = 0
+    for tag in DIV_REGEX.finditer(text, start):
+        depth += -1 if tag.group(1) else 1
+        if not depth:
+            return text[start:text.find('>', tag.end()) + 1 or len(text)]
+    return text[start:]
+
+
+def table_digest(region, rwp):
+    """Hashes a table region, so that an unchanged table is not parsed again.
+
+    Args:
+        region (str): The region returned by table_region.
+        rwp (frozenset): The ids of the rooms equipped with power plugs.
+
+    Returns:
+        bytes: A 16 byte digest of the table and of the rooms with power plugs.
+    """
+    digest = hashlib.blake2b(region.encode('utf-8'), digest_size=16)
+    digest.update(str(sorted(rwp)).encode('ascii'))
+    return digest.digest()
+
+
+class TableParser(HTMLParser):
+    """Streaming parser that collects the rows of div#tableContainer.
+
+    Everything outside the container is skipped, and no DOM is built: each row
+    is reduced to its list of cells as soon as it is closed.
+    """
+
+    def __init__(self):
+        """Initializes the parser."""
+        super().__init__()
+        self.found = False
+        self.done = False
+        self.rows = []
+        self._depth = 0 # nesting level of <div> inside the container
+        self._row = None
+        self._cell = None
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if not self._depth:
+            if tag == 'div' and dict(attrs).get('id') == CONTAINER_ID:
+                self.found = True
+                self._depth = 1
+            return
+
+        if tag == 'div':
+            self._depth += 1
+        elif tag == 'tr':
+            self._close_row()
+            self._row = ('class' in dict(attrs), [])
+        elif tag == 'td' and self._row is not None:
+            self._close_cell()
+            attrs = dict(attrs)
+            self._cell = {'classes' : (attrs.get('class') or '').split(), 'colspan' : attrs.get('colspan'), 'text' : [], 'href' : None, 'anchor' : None}
+        elif tag == 'a' and self._cell is not None and self._cell['anchor'] is None:
+            self._cell['href'] = dict(attrs).get('href')
+            self._cell['anchor'] = []
+            self._anchor = self._cell['anchor']
+
+    def handle_endtag(self, tag):
+        if self.done or not self._depth:
+            return
+        if tag == 'a':
+            self._anchor = None
+        elif tag == 'td':
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+        elif tag == 'div':
+            self._depth -= 1
+            if not self._depth:
+                self._close_row()
+                self.done = True
+
+    def handle_data(self, data):
+        if self._cell is None:
+            return
+        self._cell['text'].append(data)
+        if self._anchor is not None:
+            self._anchor.append(data)
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        cell = self._cell
+        anchor = ''.join(cell['anchor']) if cell['anchor'] is not None else None
+        self._row[1].append(Cell(cell['classes'], cell['colspan'], ''.join(cell['text']), cell['href'], anchor))
+        self._cell = None
+        self._anchor = None
+
+    def _close_row(self):
+        if self._row is None:
+            return
+        self._close_cell()
+        self.rows.append(self._row)
+        self._row = None
+
+
+def _stream_rows(text):
+    """Extracts the table rows with the streaming parser.
+
+    Args:
+        text (str): The HTML page.
+
+    Returns:
+        list: (has_class, cells) tuples, or None if the table container is missing.
+    """
+    match = CONTAINER_REGEX.search(text)
+    if not match:
+        return None
+    start = max(text.rfind('<', 0, match.start()), 0) # skip everything before the container tag
+
+    parser = TableParser()
+    chunk = 65536
+    for i in range(start, len(text), chunk):
+        parser.feed(text[i:i + chunk])
+        if parser.done:
+            break
+    parser.close()
+    if not parser.found:
+        return None
+    parser._close_row()
+    return parser.rows
+
+
+def _soup_rows(text):
+    """Extracts the table rows with BeautifulSoup.
+
+    Args:
+        text (str): The HTML page.
+
+    Returns:
+        list: (has_class, cells) tuples, or None if the table container is missing.
+    """
+    soup = BeautifulSoup(text, 'html.parser', parse_only=SoupStrainer("div", {"id": CONTAINER_ID}))
+    tableContainer = soup.find("div", {"id": CONTAINER_ID})
+    if not tableContainer:
+        return None
+
+    rows = []
+    for row in tableContainer.find_all('tr'):
+        cells = []
+        for td in row.find_all('td'):
+            a = td.find('a')
+            cells.append(Cell(td.attrs.get('class', []), td.attrs.get('colspan'), td.string, a['href'] if a else None, a.string if a else None))
+        rows.append(('class' in row.attrs, cells))
+    return rows
+
+
+BACKENDS = {'stream' : _stream_rows, 'soup' : _soup_rows}
+
+
+def parse_table(text, rwp, backend=None):
+    """Parses the occupancy table of an OccupazioniGiornoEsatto page.
+
+    Args:
+        text (str): The HTML page.
+        rwp (frozenset): The ids of the rooms equipped with power plugs.
+        backend (str, optional): 'stream' or 'soup'. Defaults to PARSER_BACKEND.
+
+    Returns:
+        dict: Building names mapped to Building objects, or None if the table container is missing.
+    """
+    rows = BACKENDS[backend or PARSER_BACKEND](text)
+    if rows is None:
+        return None
+    return build_info(rows[HEADER_ROWS:], rwp) #remove first three headers
+
+
+if __name__ == "__main__":
+    """
+    Parity check between the backends on saved pages:
+        python -m search.table_parser page1.html [page2.html ...]
+    The saved pages of tests/fixtures are checked by tests/test_table_parser.py.
+    """
+    failed = False
+    for path in sys.argv[1:]:
+        with open(path, encoding='utf-8') as f:
+            page = f.read()
+        results = {name : parse_table(page, set(), name) for name in BACKENDS}
+        same = all(result == results['soup'] for result in results.values())
+        failed = failed or not same
+        print(f"{path}: {'OK' if same else 'MISMATCH'}")
+    sys.exit(1 if failed else 0)
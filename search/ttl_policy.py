@@ -0,0 +1,63 @@
+"""
+This module decides how long an occupancy page stays cached, based on the requested date.
+
+Past days never change, today's page can change during the day and pages further
+ahead change rarely. The policy is a function and can be replaced with set_ttl_policy.
+"""
+import pytz
+from datetime import datetime , date
+
+TTL_TODAY = 900 # seconds
+TTL_TOMORROW = 3600
+TTL_THIS_WEEK = 3 * 3600 # 2 to 4 days ahead
+TTL_LATER = 6 * 3600 # 5 days ahead or more
+
+
+def default_policy(requested, today):
+    """Returns the time-to-live of a page.
+
+    Args:
+        requested (date): The day of the page.
+        today (date): Today, in Europe/Rome.
+
+    Returns:
+        int: The time-to-live in seconds, or None if the page never expires.
+    """
+    days = (requested - today).days
+    if days < 0:
+        return None
+    if days == 0:
+        return TTL_TODAY
+    if days == 1:
+        return TTL_TOMORROW
+    if days <= 4:
+        return TTL_THIS_WEEK
+    return TTL_LATER
+
+
+_policy = default_policy
+
+
+def set_ttl_policy(policy):
+    """Replaces the TTL policy.
+
+    Args:
+        policy (callable): A function (requested, today) -> seconds, or None for pages that never expire.
+    """
+    global _policy
+    _policy = policy
+
+
+def ttl_for(day, month, year):
+    """Returns the time-to-live of the page of a given day.
+
+    Args:
+        day (int): The day of the month.
+        month (int): The month (1-12).
+        year (int): The year (YYYY).
+
+    Returns:
+        int: The time-to-live in seconds, or None if the page never expires.
+    """
+    today = datetime.now(pytz.timezone('Europe/Rome')).date()
+    return _policy(date(int(year), int(month), int(day)), today)
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# the caches are opened at import time: keep them out of the repository
+_data = tempfile.mkdtemp(prefix="aulelibere-tests-")
+os.environ.setdefault("PAGE_STORE_PATH", os.path.join(_data, "pages.sqlite"))
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(_data, "snapshots"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
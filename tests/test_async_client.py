@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+from search import async_client, find_classrooms
+from search.async_client import AsyncClient
+from search.find_classrooms import EMPTY_DAY, page_key, page_store, is_stale
+from search.http_client import ScrapingClient
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "occupancy_MIA.html")
+
+
+class StubPolimi:
+    """A local OccupazioniGiornoEsatto serving a saved page, or an error status."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = 0
+        with open(FIXTURE, encoding="utf-8") as f:
+            self.page = f.read()
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.status != 200:
+            return web.Response(status=self.status, text="Service Unavailable")
+        return web.Response(text=self.page, content_type="text/html")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/OccupazioniGiornoEsatto.do", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/OccupazioniGiornoEsatto.do"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+def _run(monkeypatch, status, lookups):
+    async def main():
+        async with StubPolimi(status) as stub:
+            monkeypatch.setattr(async_client, "URL", stub.url)
+            client = AsyncClient(retries=1, backoff=0)
+            try:
+                return stub, await lookups(client)
+            finally:
+                await client.close()
+    return asyncio.run(main())
+
+
+def test_second_lookup_is_a_cache_hit(monkeypatch):
+    async def lookups(client):
+        first = await client.find_classrooms('MIA', 2, 11, 2026)
+        second = await client.find_classrooms('MIA', 2, 11, 2026)
+        return first, second
+
+    stub, (first, second) = _run(monkeypatch, 200, lookups)
+
+    assert stub.requests == 1
+    assert first == second
+    assert [lesson.name for lesson in first['Edificio 3'].rooms['3.0.1'].lessons] == ['Analisi Matematica 1', 'Fisica Sperimentale']
+
+
+def test_fresh_page_store_entry_skips_the_network(monkeypatch):
+    with open(FIXTURE, encoding="utf-8") as f:
+        page_store.put(page_key('MIA', 3, 11, 2026), f.read(), time.time() + 3600)
+
+    stub, info = _run(monkeypatch, 200, lambda client: client.find_classrooms('MIA', 3, 11, 2026))
+
+    assert stub.requests == 0
+    assert '3.0.1' in info['Edificio 3'].rooms
+
+
+def test_downloads_are_shared_through_the_page_store(monkeypatch):
+    hits = page_store.hits
+    _run(monkeypatch, 200, lambda client: client.load_day('MIA', 6, 11, 2026))
+
+    stored = page_store.get(page_key('MIA', 6, 11, 2026))
+
+    assert stored is not None and stored.fresh
+    assert page_store.hits == hits + 1
+
+
+def test_expired_page_is_served_on_5xx(monkeypatch):
+    with open(FIXTURE, encoding="utf-8") as f:
+        page_store.put(page_key('MIA', 4, 11, 2026), f.read(), time.time() - 60)
+
+    stub, parsed = _run(monkeypatch, 503, lambda client: client.load_day('MIA', 4, 11, 2026))
+
+    assert stub.requests == 2 # one retry
+    assert is_stale(parsed)
+    assert 'B.2.1' in parsed.info['Edificio 11'].rooms
+
+
+def test_5xx_without_a_stored_page_is_an_empty_day_in_both_clients(monkeypatch):
+    monkeypatch.setattr(find_classrooms, "_client", ScrapingClient(retries=1, backoff=0))
+
+    async def lookups(client):
+        monkeypatch.setattr(find_classrooms, "URL", async_client.URL)
+        sync = await asyncio.get_running_loop().run_in_executor(None, find_classrooms.load_day, 'MIA', 7, 11, 2026)
+        return sync, await client.load_day('MIA', 5, 11, 2026)
+
+    stub, (sync, parsed) = _run(monkeypatch, 503, lookups)
+
+    assert sync is EMPTY_DAY and parsed is EMPTY_DAY
+    assert stub.requests == 4 # one retry each
@@ -0,0 +1,45 @@
+import time
+
+from search.cache import TTLCache
+
+
+def test_expired_entry_is_served_as_stale():
+    cache = TTLCache(4, 60, stale_ttl=600)
+    cache.put('MIA', 'day', expires_at=time.time() - 1)
+
+    assert cache.get('MIA') is None
+    assert cache.get_stale('MIA') == ('day', False)
+
+
+def test_fresh_entry():
+    cache = TTLCache(4, 60, stale_ttl=600)
+    cache.put('MIA', 'day')
+
+    assert cache.get('MIA') == 'day'
+    assert cache.get_stale('MIA') == ('day', True)
+
+
+def test_entry_is_dropped_after_the_stale_window():
+    cache = TTLCache(4, 60, stale_ttl=600)
+    cache.put('MIA', 'day', expires_at=time.time() - 601)
+
+    assert cache.get_stale('MIA') == (None, False)
+    assert len(cache) == 0
+
+
+def test_without_stale_window_expired_entries_are_misses():
+    cache = TTLCache(4, 60)
+    cache.put('MIA', 'day', expires_at=time.time() - 1)
+
+    assert cache.get_stale('MIA') == (None, False)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2, 60)
+    cache.put('MIA', 1)
+    cache.put('MIB', 2)
+    cache.get('MIA')
+    cache.put('LCF', 3)
+
+    assert cache.get('MIB') is None
+    assert cache.get('MIA') == 1
@@ -0,0 +1,56 @@
+import os
+import time
+import threading
+
+from search import find_classrooms as fc
+from search.find_classrooms import EMPTY_DAY, find_classrooms, load_day, page_key, page_store, store_day
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "occupancy_MIA.html")
+
+MAINTENANCE = "<html><body><p>Servizio in manutenzione</p></body></html>"
+EMPTY_TABLE = '<div id="tableContainer"><table><tr><td>Aula</td></tr><tr></tr><tr></tr></table></div>'
+
+
+def test_page_without_table_is_not_stored():
+    assert store_day('MIA', 1, 11, 2026, MAINTENANCE) is EMPTY_DAY
+    assert page_store.expiry(page_key('MIA', 1, 11, 2026)) is None
+
+
+def test_empty_table_of_a_past_day_expires():
+    parsed = store_day('MIA', 1, 9, 2025, EMPTY_TABLE)
+
+    assert parsed.expires_at < time.time() + 86400
+    assert page_store.expiry(page_key('MIA', 1, 9, 2025)) == parsed.expires_at
+
+
+def test_warm_find_classrooms_does_not_decode_again():
+    with open(FIXTURE, encoding="utf-8") as f:
+        store_day('MIA', 2, 12, 2026, f.read())
+
+    assert find_classrooms('MIA', 2, 12, 2026) is find_classrooms('MIA', 2, 12, 2026)
+
+
+def test_expired_day_is_served_while_one_refresh_runs(monkeypatch):
+    with open(FIXTURE, encoding="utf-8") as f:
+        parsed = store_day('MIA', 3, 12, 2026, f.read())
+    stale = parsed._replace(expires_at=time.time() - 1)
+    fc._parsed.put(('MIA', 3, 12, 2026), stale, stale.expires_at)
+    release = threading.Event()
+    refreshes = []
+
+    def fetch_day(*args):
+        refreshes.append(args)
+        release.wait(5)
+        fc._parsed.put(('MIA', 3, 12, 2026), parsed, parsed.expires_at)
+        return parsed
+
+    monkeypatch.setattr(fc, '_fetch_day', fetch_day)
+    assert load_day('MIA', 3, 12, 2026) is stale
+    assert load_day('MIA', 3, 12, 2026) is stale
+    release.set()
+    deadline = time.time() + 5
+    while load_day('MIA', 3, 12, 2026) is stale:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    assert len(refreshes) == 1
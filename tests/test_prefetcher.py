@@ -0,0 +1,59 @@
+import time
+from types import SimpleNamespace
+
+from search.find_classrooms import page_key, page_store
+from search.prefetcher import Prefetcher
+
+LOCATIONS = {"Fresh": {"code": "PF1"}, "Expiring": {"code": "PF2"}, "Missing": {"code": "PF3"}}
+
+
+class FakeJobQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, context=None):
+        self.jobs.append((callback, when, context))
+
+
+def _prefetcher():
+    prefetcher = Prefetcher(LOCATIONS, days=1, interval=600, stagger=2.0)
+    today = prefetcher.dates()[0]
+    page_store.put(page_key("PF1", today.day, today.month, today.year), "<html></html>", time.time() + 3600)
+    page_store.put(page_key("PF2", today.day, today.month, today.year), "<html></html>", time.time() + 60)
+    return prefetcher, today
+
+
+def test_fresh_stored_pages_are_not_fetched_again():
+    prefetcher, today = _prefetcher()
+
+    prefetcher.seed()
+
+    assert prefetcher.due() == [("PF3", today), ("PF2", today)]
+
+
+def test_fetches_are_staggered_jobs():
+    prefetcher, today = _prefetcher()
+    job_queue = FakeJobQueue()
+
+    prefetcher.run(SimpleNamespace(job_queue=job_queue))
+    prefetcher.run(SimpleNamespace(job_queue=job_queue)) # the first fetches are still waiting
+
+    assert [(when, context) for _, when, context in job_queue.jobs] == [(0.0, ("PF3", today)), (2.0, ("PF2", today))]
+    assert prefetcher.scheduled == {("PF3", today), ("PF2", today)}
+
+
+def test_fetch_is_rescheduled_when_no_slot_is_free(monkeypatch):
+    prefetcher = Prefetcher(LOCATIONS, days=1, max_workers=1, stagger=2.0)
+    today = prefetcher.dates()[0]
+    warmed = []
+    monkeypatch.setattr(prefetcher, "warm", lambda code, date: warmed.append(code))
+    job_queue = FakeJobQueue()
+    context = SimpleNamespace(job_queue=job_queue, job=SimpleNamespace(context=("PF3", today)))
+
+    prefetcher._slots.acquire() # a fetch in progress
+    prefetcher._warm_job(context)
+    prefetcher._slots.release()
+    prefetcher._warm_job(context)
+
+    assert [(when, job_context) for _, when, job_context in job_queue.jobs] == [(2.0, ("PF3", today))]
+    assert warmed == ["PF3"]
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from search import room_index, numpy_engine
+from search.find_classrooms import ParsedDay
+from search.free_classroom import _is_room_free
+from search.snapshot import DaySnapshot, dump
+from search.table_parser import parse_table
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+WINDOWS = [(a / 4, b / 4) for a in range(30, 82) for b in range(a + 1, 84)]
+ENGINES = [room_index] + ([numpy_engine] if numpy_engine.np is not None else [])
+
+
+def _day(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        info = parse_table(f.read(), frozenset(), 'stream')
+    return info, DaySnapshot(dump(info))
+
+
+@pytest.mark.parametrize("engine", ENGINES, ids=lambda engine: engine.__name__)
+@pytest.mark.parametrize("name", ["occupancy_MIA.html", "occupancy_MIB.html"])
+def test_engines_answer_like_a_scan(engine, name):
+    info, snap = _day(name)
+    index = engine.build_index(snap)
+
+    for start, end in WINDOWS:
+        expected = sorted((building, room.name, until) for building in info for room in info[building].rooms.values()
+                          for free, until in [_is_room_free(room.lessons, start, end)] if free)
+        found = sorted((building, snap.room_display(r)[0], float(until)) for building, r, until in engine.free_rooms(index, start, end))
+        assert found == expected, (start, end)
+
+
+def test_index_keeps_no_room_data():
+    _, snap = _day("occupancy_MIB.html")
+    index = room_index.build_index(snap)
+
+    assert index.snapshot is snap
+    assert all(isinstance(mask, int) for mask in index.masks)
+    assert snap.room_display(0) == ('BL.27.0.1', 'https://onlineservices.polimi.it/spazi/spazi/controller/EsploraAulaInformazioni.do?idaula=301', False)
+
+
+def test_decoded_info_is_kept():
+    _, snap = _day("occupancy_MIA.html")
+    parsed = ParsedDay(snap, room_index.build_index(snap), None, None)
+
+    assert parsed.info is parsed.info
+
+
+def test_room_mask_sets_the_slots_of_the_lessons():
+    assert room_index.room_mask([(1, 2), (5, 1), (7, 0)]) == 0b100110
+
+
+def test_until_follows_the_table_order():
+    starts, order = room_index.room_starts([(10, 2), (4, 2)])
+
+    assert (starts, order) == ([4, 10], [10, 4])
+    assert room_index.until(starts, order, 3) == room_index.to_time(10)
+    assert room_index.until(*room_index.room_starts([(4, 2), (10, 2)]), 3) == room_index.to_time(4)
+    assert room_index.until([], None, 3) == room_index.MAX_TIME
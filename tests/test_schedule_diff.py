@@ -0,0 +1,41 @@
+from search.model import Building, Lesson, Room
+from search.schedule_diff import RoomChange, diff_days
+
+ANALISI = Lesson('Analisi', 8.25, 10.25)
+FISICA = Lesson('Fisica', 10.25, 12.25)
+
+
+def _day(**rooms):
+    """Builds a day of building B1 with the given rooms, as name=[lessons]."""
+    building = Building('B1')
+    for i, (name, lessons) in enumerate(rooms.items()):
+        building.rooms[name] = Room(name, f'link?idaula={i}', i, False, list(lessons))
+    return {'B1': building}
+
+
+def test_unchanged_day_has_no_changes():
+    assert diff_days(_day(A=[ANALISI]), _day(A=[ANALISI])) == []
+
+
+def test_added_and_removed_lessons():
+    changes = diff_days(_day(A=[ANALISI]), _day(A=[FISICA]))
+
+    assert changes == [RoomChange('B1', 'A', [FISICA], [ANALISI])]
+
+
+def test_repeated_lessons_are_counted():
+    changes = diff_days(_day(A=[ANALISI, ANALISI]), _day(A=[ANALISI]))
+
+    assert changes == [RoomChange('B1', 'A', [], [ANALISI])]
+
+
+def test_new_and_dropped_rooms():
+    changes = diff_days(_day(A=[ANALISI], B=[]), _day(B=[], C=[FISICA]))
+
+    assert changes == [RoomChange('B1', 'C', [FISICA], []), RoomChange('B1', 'A', [], [ANALISI])]
+
+
+def test_new_building():
+    changes = diff_days({}, _day(A=[ANALISI], B=[]))
+
+    assert changes == [RoomChange('B1', 'A', [ANALISI], [])]
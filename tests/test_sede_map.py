@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from search import sede_map
+from search.find_classrooms import load_day, store_day
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "occupancy_MIA.html")
+
+
+@pytest.fixture
+def sede_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(sede_map, "SEDE_FILE", str(tmp_path / "sedeBuildings.json"))
+    monkeypatch.setattr(sede_map, "_mtime", None)
+    monkeypatch.setattr(sede_map, "_sedi", {})
+    monkeypatch.setattr(sede_map, "_observed", {})
+    monkeypatch.setattr(sede_map, "_rejected", set())
+    return tmp_path / "sedeBuildings.json"
+
+
+def _pages():
+    with open(FIXTURE, encoding="utf-8") as f:
+        campus = f.read()
+    # the sede page lists building 11 only
+    head, rest = campus.split('<tr><td class="innerEdificio"', 1)
+    sede = head + '<tr><td class="innerEdificio"' + rest.split('<tr><td class="innerEdificio"', 1)[1]
+    return campus, sede
+
+
+def test_sede_is_mapped_after_matching_its_campus(sede_file):
+    campus, sede = _pages()
+    for day in range(sede_map.LEARN_DAYS):
+        assert sede_map.campus_of('MIA01') is None
+        store_day('MIA', 10 + day, 11, 2026, campus)
+        store_day('MIA01', 10 + day, 11, 2026, sede)
+
+    assert sede_file.exists()
+    assert sede_map.campus_of('MIA01') == 'MIA'
+    assert sede_map.buildings_of('MIA01') == {'Edificio 11'}
+    # later days are filtered from the campus page
+    store_day('MIA', 20, 11, 2026, campus)
+    assert set(load_day('MIA01', 20, 11, 2026).info) == {'Edificio 11'}
+
+
+def test_sede_differing_from_its_campus_is_not_mapped(sede_file):
+    campus, sede = _pages()
+    store_day('MIA', 15, 11, 2026, campus)
+    store_day('MIA02', 15, 11, 2026, sede.replace('B.2.1', 'B.2.9'))
+
+    assert sede_map.campus_candidate('MIA02') is None
+    assert not sede_file.exists()
@@ -0,0 +1,80 @@
+import time
+import threading
+
+import pytest
+
+from search.singleflight import SingleFlight
+
+
+def _concurrent(group, key, fn, callers=8):
+    """Calls group.do from several threads at once, returning their results or exceptions."""
+    results = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = group.do(key, fn)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_share_one_run():
+    group = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return object()
+
+    threads, results = _concurrent(group, 'MIA', fetch)
+    _wait_for(lambda: group.coalesced == len(threads) - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(runs) == 1
+    assert results[0] is not None
+    assert all(result is results[0] for result in results)
+
+
+def test_waiters_receive_the_exception():
+    group = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError("PoliMi is down")
+
+    threads, results = _concurrent(group, 'MIA', fetch, callers=4)
+    _wait_for(lambda: group.coalesced == len(threads) - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_later_calls_run_again():
+    group = SingleFlight()
+    runs = []
+
+    group.do('MIA', runs.append, 1)
+    with pytest.raises(KeyError):
+        group.do('MIA', {}.__getitem__, 'missing')
+    group.do('MIA', runs.append, 2)
+
+    assert runs == [1, 2]
+    assert group.coalesced == 0
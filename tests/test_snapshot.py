@@ -0,0 +1,47 @@
+import os
+
+from search import snapshot
+from search.snapshot import DaySnapshot, dump
+from search.table_parser import parse_table, table_digest, table_region
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "occupancy_MIA.html")
+
+
+def _page():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_saved_snapshot_decodes_to_the_parsed_day(tmp_path):
+    info = parse_table(_page(), frozenset(), 'stream')
+    path = str(tmp_path / "MIA.snap")
+    snapshot.save(path, dump(info, 1000.0, 2000.0, b'd' * 16))
+
+    snap = snapshot.load(path)
+
+    assert snap.to_info() == info
+    assert (snap.fetched_at, snap.expires_at, snap.digest) == (1000.0, 2000.0, b'd' * 16)
+
+
+def test_retimed_snapshot_keeps_its_digest():
+    snap = DaySnapshot(dump({}, 1000.0, 2000.0, b'd' * 16))
+
+    retimed = DaySnapshot(snap.retimed(3000.0, 4000.0))
+
+    assert (retimed.fetched_at, retimed.expires_at, retimed.digest) == (3000.0, 4000.0, b'd' * 16)
+
+
+def test_invalid_file_is_not_loaded(tmp_path):
+    path = tmp_path / "MIA.snap"
+    path.write_bytes(b'not a snapshot')
+
+    assert snapshot.load(str(path)) is None
+    assert snapshot.load(str(tmp_path / "missing.snap")) is None
+
+
+def test_table_digest_changes_with_the_table():
+    region = table_region(_page())
+
+    assert table_digest(region, frozenset()) == table_digest(region, frozenset())
+    assert table_digest(region, frozenset()) != table_digest(region, frozenset({301}))
+    assert table_digest(region, frozenset()) != table_digest(region.replace('Analisi', 'Fisica', 1), frozenset())
@@ -0,0 +1,90 @@
+import time
+import threading
+
+from telegram import Bot
+
+from functions.sqlite_persistence import SQLitePersistence
+
+
+def _persistence(tmp_path):
+    pp = SQLitePersistence(str(tmp_path / "bot.sqlite"))
+    pp.update_user_data(1, {'lang': 'EN'})
+    pp.update_chat_data(1, {'watches': []})
+    pp.update_user_data(2, {'lang': 'IT'})
+    pp.refresh_user_data(2, {})
+    pp.update_user_data(2, {'lang': 'IT'})
+    pp._db.execute("UPDATE user_data SET last_seen = ? WHERE id = 1", (time.time() - 10 * 86400,))
+    return pp
+
+
+def test_compact_removes_idle_users(tmp_path):
+    pp = _persistence(tmp_path)
+
+    result = pp.compact(86400)
+
+    assert result.users == [1]
+    assert set(pp.get_user_data()) == {2}
+    assert 1 not in pp.get_chat_data()
+
+
+def test_compacted_users_are_not_written_back(tmp_path):
+    pp = _persistence(tmp_path)
+    pp.compact(86400)
+
+    # the JobQueue saves every user of the dispatcher after each job
+    pp.update_user_data(1, {'lang': 'EN'})
+    pp.update_chat_data(1, {'watches': []})
+
+    assert set(pp.get_user_data()) == {2}
+    assert 1 not in pp.get_chat_data()
+
+
+def test_compacted_users_are_stored_again_when_they_come_back(tmp_path):
+    pp = _persistence(tmp_path)
+    pp.compact(86400)
+
+    pp.refresh_user_data(1, {})
+    pp.update_user_data(1, {'lang': 'EN'})
+
+    assert pp.get_user_data()[1] == {'lang': 'EN'}
+
+
+def test_on_remove_runs_before_the_rows_are_deleted(tmp_path):
+    pp = _persistence(tmp_path)
+    rows = []
+
+    def forget(users, conversations):
+        rows.extend(pp._db.execute("SELECT id FROM user_data WHERE id IN (%s)" % ",".join("?" * len(users)), users))
+
+    pp.compact(86400, on_remove=forget)
+
+    assert rows == [(1,)]
+
+
+def test_jobs_save_only_bot_data(tmp_path):
+    from telegram.ext import Dispatcher, JobQueue
+    from functions.sqlite_persistence import save_bot_data_after_jobs
+
+    pp = SQLitePersistence(str(tmp_path / "bot.sqlite"))
+    job_queue = JobQueue()
+    dispatcher = Dispatcher(Bot("123:abc"), None, job_queue=job_queue, persistence=pp, use_context=True)
+    job_queue.set_dispatcher(dispatcher)
+    save_bot_data_after_jobs(job_queue, pp)
+    for user_id in range(100):
+        dispatcher.user_data[user_id]['preference'] = {'lang': 'EN'}
+    done = threading.Event()
+
+    def job(context):
+        context.bot_data['watches'] = {1: []}
+
+    job_queue.start()
+    try:
+        job_queue.run_once(job, 0)
+        job_queue.run_once(lambda context: done.set(), 0.2)
+        assert done.wait(5)
+        time.sleep(0.1)
+    finally:
+        job_queue.stop()
+
+    assert pp.get_bot_data() == {'watches': {1: []}}
+    assert pp.get_user_data() == {}
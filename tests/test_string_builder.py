@@ -0,0 +1,56 @@
+from telegram.constants import MAX_MESSAGE_LENGTH
+
+from functions.string_builder import join_messages, pack_messages
+
+
+def _building(name, rooms, width=100):
+    """A rendered building of `rooms` lines of `width` characters."""
+    return f'\n<b>{name}</b>\n', [f'{name}.{i}'.ljust(width - 1, '.') + '\n' for i in range(rooms)]
+
+
+def _lines(messages):
+    return sorted(line for message in messages for line in message.splitlines(keepends=True) if not line.startswith(('\n', '<b>')))
+
+
+def test_messages_fit_the_telegram_limit():
+    buildings = [_building(f'B{i}', rooms) for i, rooms in enumerate([3, 60, 12, 45, 1, 30])]
+
+    messages = pack_messages(buildings, reserve=256)
+
+    assert len(messages[0]) <= MAX_MESSAGE_LENGTH - 256
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+    assert _lines(messages) == sorted(line for _, lines in buildings for line in lines)
+
+
+def test_oversized_building_repeats_its_title():
+    title, lines = _building('B1', 100)
+
+    messages = pack_messages([(title, lines)])
+
+    assert len(messages) == 3
+    assert all(message.startswith(title) and len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+
+
+def test_join_messages_merges_up_to_the_limit():
+    parts = ['a' * 2000, 'b' * 2000, 'c' * 2000]
+
+    assert join_messages(parts) == ['a' * 2000 + '\n' + 'b' * 2000, 'c' * 2000]
+
+
+def test_buildings_are_kept_whole_when_it_costs_no_message():
+    buildings = [_building('A', 25), _building('B', 25), _building('C', 15)]
+
+    messages = pack_messages(buildings)
+
+    assert len(messages) == 2
+    assert [[title for title, _ in buildings if title in message] for message in messages] == [['\n<b>A</b>\n', '\n<b>C</b>\n'], ['\n<b>B</b>\n']]
+    assert messages[0].index('<b>A</b>') < messages[0].index('<b>C</b>')
+
+
+def test_buildings_are_split_when_it_saves_messages():
+    buildings = [_building(name, 22) for name in 'ABCD']
+
+    messages = pack_messages(buildings)
+
+    assert len(messages) == 3
+    assert _lines(messages) == sorted(line for _, lines in buildings for line in lines)
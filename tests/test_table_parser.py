@@ -0,0 +1,46 @@
+import os
+import glob
+
+import pytest
+
+from search.model import export
+from search.table_parser import BACKENDS, parse_table, table_region
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURE_DIR, "occupancy_*.html")))
+
+
+def _page(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+@pytest.mark.parametrize("cut", [False, True], ids=["page", "region"])
+def test_backends_return_identical_days(path, cut):
+    page = _page(path)
+    if cut:
+        page = table_region(page)
+    rwp = frozenset({101, 402})
+
+    days = {name: parse_table(page, rwp, name) for name in BACKENDS}
+
+    assert days['stream'] == days['soup']
+    assert export(days['stream']) == export(days['soup'])
+
+
+def test_entities_repeated_rooms_and_empty_rows():
+    day = parse_table(_page(os.path.join(FIXTURE_DIR, "occupancy_MIB.html")), frozenset({402}), 'stream')
+
+    assert list(day) == ['-', 'Edificio BL.27', 'Edificio B9']
+    repeated = day['Edificio BL.27'].rooms['BL.27.0.1']
+    assert [(lesson.name, lesson.start, lesson.end) for lesson in repeated.lessons] == [
+        ('Fondamenti di Automatica', 8.25, 10.25), ('Esercitazione – Gruppo 2', 9.25, 11.25)]
+    assert [lesson.name for lesson in day['Edificio B9'].rooms['B9.1.1'].lessons] == ['Chimica & Materiali', "Laboratorio d'Informatica"]
+    assert day['Edificio B9'].rooms['B9.1.1'].powerPlugs
+    assert 'B9.1.2' in day['Edificio B9'].rooms
+
+
+def test_missing_container():
+    for name in BACKENDS:
+        assert parse_table("<html><body><p>Servizio non disponibile</p></body></html>", frozenset(), name) is None
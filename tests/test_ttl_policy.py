@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+
+import pytest
+
+from search import ttl_policy
+from search.ttl_policy import TTL_LATER, TTL_THIS_WEEK, TTL_TODAY, TTL_TOMORROW, default_policy, set_ttl_policy, ttl_for
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.mark.parametrize("days, ttl", [
+    (-30, None), (-1, None), (0, TTL_TODAY), (1, TTL_TOMORROW),
+    (2, TTL_THIS_WEEK), (4, TTL_THIS_WEEK), (5, TTL_LATER), (60, TTL_LATER),
+])
+def test_date_buckets(days, ttl):
+    assert default_policy(TODAY + timedelta(days=days), TODAY) == ttl
+
+
+def test_policy_can_be_replaced(monkeypatch):
+    monkeypatch.setattr(ttl_policy, '_policy', ttl_policy._policy)
+    set_ttl_policy(lambda requested, today: 42)
+
+    assert ttl_for(1, 1, 2020) == 42
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from functions import user_data_handler
+from functions.user_data_handler import SESSION_TTL, clear_session, get_session
+from search import cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(user_data_handler, '_sessions', cache.TTLCache(10, SESSION_TTL))
+    return now
+
+
+def _update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+
+def test_session_expires_after_its_ttl(clock):
+    get_session(_update(1))['location'] = 'MIA'
+    clock[0] += SESSION_TTL + 1
+
+    assert get_session(_update(1)) == {}
+
+
+def test_each_step_extends_the_session(clock):
+    get_session(_update(1))['location'] = 'MIA'
+    clock[0] += SESSION_TTL - 1
+    get_session(_update(1))['date'] = '20/10/2026'
+    clock[0] += SESSION_TTL - 1
+
+    assert get_session(_update(1)) == {'location': 'MIA', 'date': '20/10/2026'}
+    assert get_session(_update(2)) == {}
+
+
+def test_cleared_session_is_empty(clock):
+    get_session(_update(1))['location'] = 'MIA'
+    clear_session(_update(1))
+
+    assert get_session(_update(1)) == {}
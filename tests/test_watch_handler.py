@@ -0,0 +1,69 @@
+import pytz
+from datetime import datetime
+
+from functions.watch_handler import update_free, watch_window
+from search.find_classrooms import ENGINE, ParsedDay
+from search.free_classroom import free_rooms_of_day
+from search.model import Building, Lesson, Room
+from search.snapshot import DaySnapshot, dump
+
+ROME = pytz.timezone('Europe/Rome')
+
+
+def _watch(date='20/10/2026', start_time=8, end_time=12):
+    return {'location': 'MIA', 'date': date, 'start_time': start_time, 'end_time': end_time, 'free': []}
+
+
+def _day():
+    building = Building('B1')
+    room = Room('1.1', 'link?idaula=1', 1, False)
+    room.lessons.append(Lesson('Analisi', 8.25, 10.25))
+    building.rooms[room.name] = room
+    snap = DaySnapshot(dump({'B1': building}))
+    return ParsedDay(snap, ENGINE.build_index(snap), None, None)
+
+
+def test_window_of_another_day_is_unchanged():
+    now = ROME.localize(datetime(2026, 10, 19, 10, 40))
+    assert watch_window(_watch(), now) == (8.25, 12.25)
+
+
+def test_window_of_today_starts_at_the_current_quarter_hour():
+    now = ROME.localize(datetime(2026, 10, 20, 10, 40))
+    assert watch_window(_watch(), now) == (10.75, 12.25)
+
+
+def test_window_is_over():
+    now = ROME.localize(datetime(2026, 10, 20, 12, 30))
+    assert watch_window(_watch(), now) is None
+
+
+def test_window_of_today_uses_the_table_time_of_the_hours():
+    now = ROME.localize(datetime(2026, 10, 20, 10, 0))
+    assert watch_window(_watch(), now) == (10.25, 12.25)
+
+
+def test_room_is_free_from_the_end_of_its_lesson():
+    parsed = _day() # lesson until 10.25, i.e. the 10 o'clock of end_state
+    before = ROME.localize(datetime(2026, 10, 20, 9, 45))
+    boundary = ROME.localize(datetime(2026, 10, 20, 10, 0))
+
+    assert free_rooms_of_day(parsed, *watch_window(_watch(), before)) == {}
+    assert [room.name for room in free_rooms_of_day(parsed, *watch_window(_watch(), boundary))['B1']] == ['1.1']
+
+
+def test_room_is_free_once_its_lesson_has_ended():
+    parsed = _day()
+    before = ROME.localize(datetime(2026, 10, 20, 9, 0))
+    after = ROME.localize(datetime(2026, 10, 20, 10, 40))
+
+    assert free_rooms_of_day(parsed, *watch_window(_watch(), before)) == {}
+    assert [room.name for room in free_rooms_of_day(parsed, *watch_window(_watch(), after))['B1']] == ['1.1']
+
+
+def test_update_free_returns_the_rooms_known_before():
+    watch = _watch()
+    watch['free'] = [['B1', '1.1']]
+
+    assert update_free(watch, [['B1', '1.2']]) == {('B1', '1.1')}
+    assert watch['free'] == [['B1', '1.2']]
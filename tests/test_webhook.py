@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import signal
+import socket
+import importlib
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram.ext import Updater, MessageHandler, Filters
+
+TOKEN = "123456:TEST"
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Answers the Bot API methods called by the updater."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        method = self.path.rsplit('/', 1)[-1]
+        if method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Aule", "username": "aule_test_bot"}
+        else:
+            result = True
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _update(update_id, text):
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": 42, "type": "private"}, "from": {"id": 42, "is_bot": False, "first_name": "Test"}}}
+
+
+def test_queued_updates_are_handled_before_serve_returns(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # the bot writes its logs and data in the working directory
+    bot = importlib.import_module('bot')
+
+    api = ThreadingHTTPServer(('127.0.0.1', 0), StubBotAPI)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    handled = []
+
+    def slow(update, context):
+        time.sleep(1.5) # still running when SIGTERM arrives
+        handled.append(update.message.text)
+
+    updater = Updater(token=TOKEN, use_context=True, base_url=f"http://127.0.0.1:{api.server_port}/bot")
+    updater.dispatcher.add_handler(MessageHandler(Filters.text, slow))
+    port = _free_port()
+    updater.start_webhook(listen='127.0.0.1', port=port, url_path=TOKEN, webhook_url=f"https://example.org/{TOKEN}")
+
+    def telegram():
+        for update_id, text in enumerate(("first", "second"), 1):
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/{TOKEN}", json.dumps(_update(update_id, text)).encode(),
+                                             {'Content-Type': 'application/json'})
+            urllib.request.urlopen(request, timeout=5).close()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    threading.Thread(target=telegram, daemon=True).start()
+    try:
+        bot.serve(updater)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        api.shutdown()
+
+    assert handled == ["first", "second"]
+    assert not updater.running